@@ -52,9 +52,9 @@ commands = CommandsSingleton()
 
 # Load modules exposing commands, to make sure the commands module contains all core
 # commands
-from . import (clipboard, commandmode, commandtools, completer, document, filecommands,
-               insertoperations, operators, repeat, search, selecting,
-               undotree, pointer, prompt)
+from . import (clipboard, commandmode, commandtools, completer, document, documentsearch,
+               filecommands, insertoperations, macro, operators, repeat, search,
+               selecting, undotree, undopersistence, pointer, prompt, session)
 
 # Load standard plugins
 from . import formatting
@@ -22,9 +22,14 @@ class Clipboard:
     storage = []
 
     def push(self, content):
-        """Push content on the clipboard stack. Content must be a list of strings."""
+        """
+        Push content on the clipboard stack.
+        Content must be a list of strings or TextSlices.
+        TextSlices are materialised, since the clipboard is shared by all documents
+        and outlives the text revisions they refer to.
+        """
         assert isinstance(content, list)
-        self.storage.append(content)
+        self.storage.append([str(piece) for piece in content])
 
     def peek(self, offset=0):
         """Return the content with offset relative to the top of the clipboard stack."""
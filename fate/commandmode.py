@@ -52,15 +52,22 @@ def evaluate(document, command):
     """Evaluate a command."""
     scope = get_scope(document)
 
-    try:
-        result = eval(command, scope)
-    except SyntaxError:
-        # Probably command is a statement, not an expression
+    # Group all edits made by the command, such that they can be undone at once
+    # and the view is only updated afterwards
+    with document.transaction(group_undo=False):
         try:
-            exec(command, scope)
+            with document.transaction():
+                result = eval(command, scope)
+        except SyntaxError:
+            # Probably command is a statement, not an expression
+            try:
+                with document.transaction():
+                    exec(command, scope)
+            except Exception as e:
+                return command + ' : ' + str(e)
         except Exception as e:
             return command + ' : ' + str(e)
-    except Exception as e:
-        return command + ' : ' + str(e)
-    else:
-        return result(document)
+        else:
+            # Commands that move through the undotree can't be part of a sequence
+            with document.transaction(not getattr(result, 'navigates_undotree', False)):
+                return result(document)
@@ -78,6 +78,11 @@ class Completable(InsertMode):
         if self.complete_enabled(doc):
             self.update_completions(doc)
 
+    def insert_burst(self, doc, keys):
+        InsertMode.insert_burst(self, doc, keys)
+        if self.complete_enabled(doc):
+            self.update_completions(doc)
+
 
 #
 # EXAMPLE FOR COMPLETABLE
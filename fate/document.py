@@ -7,6 +7,7 @@ from .navigation import center_around_selection, is_position_visible
 from .selecting import SelectModes
 from .mode import Mode
 
+from contextlib import contextmanager
 from logging import error, info, debug
 
 documentlist = []
@@ -29,6 +30,8 @@ class Document:
 
     _text = ''
     _mode = None
+    # Increases whenever the text changes
+    revision = 0
 
     expandtab = False
     tabwidth = 4
@@ -37,6 +40,10 @@ class Document:
     locked_selection = None
     saved = True
 
+    _transaction_depth = 0
+    _text_changed = False
+    _selection_changed = False
+
     def __init__(self, filename=''):
         documentlist.append(self)
         self.OnTextChanged = Event('OnTextChanged')
@@ -45,6 +52,9 @@ class Document:
         self.OnQuit = Event('OnQuit')
         self.OnActivate = Event('OnActivate')
         self.OnSelectionChange = Event('OnSelectionChange')
+        # Fired with the operation, the old and the new text just before an
+        # operation replaces the text
+        self.OnApplyOperation = Event('OnApplyOperation')
 
         self.filename = filename
         if filename:
@@ -108,6 +118,36 @@ class Document:
             raise ValueError('Object {} is not an instance of Mode'.format(value))
         self._mode = value
 
+    @contextmanager
+    def transaction(self, group_undo=True):
+        """
+        Context manager to group a batch of edits, e.g. from a script.
+        The edits are recorded as a single node in the undotree, unless group_undo is
+        False, which allows the batch to move through the undotree itself.
+        OnTextChanged and OnSelectionChange are fired at most once, when the
+        outermost transaction ends, so that the view and plugins are updated only once.
+        """
+        self._transaction_depth += 1
+        if group_undo:
+            self.undotree.start_sequence()
+        try:
+            yield self
+        finally:
+            if group_undo:
+                self.undotree.end_sequence()
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._commit_transaction()
+
+    def _commit_transaction(self):
+        """Fire the events that have been held back during a transaction."""
+        if self._text_changed:
+            self._text_changed = False
+            self.OnTextChanged.fire(self)
+        if self._selection_changed:
+            self._selection_changed = False
+            self._selection_updated()
+
     @property
     def text(self):
         return self._text
@@ -115,9 +155,13 @@ class Document:
     @text.setter
     def text(self, value):
         self._text = value
+        self.revision += 1
 
         self.saved = False
-        self.OnTextChanged.fire(self)
+        if self._transaction_depth:
+            self._text_changed = True
+        else:
+            self.OnTextChanged.fire(self)
 
     @property
     def selection(self):
@@ -130,6 +174,12 @@ class Document:
         value.validate(self)
         self._selection = value
 
+        if self._transaction_depth:
+            self._selection_changed = True
+        else:
+            self._selection_updated()
+
+    def _selection_updated(self):
         # Update the userinterface viewport to center around first interval
         if not is_position_visible(self, self._selection[-1][1]):
             center_around_selection(self)
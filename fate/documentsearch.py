@@ -0,0 +1,158 @@
+"""
+This module provides searching a pattern in all open documents at once.
+
+The texts of the documents are taken as they are when the search starts, and are
+searched by a pool of worker threads, so that the editor stays responsive.
+The matches are listed in a new document, one per line, as they are found.
+The listing is extended in the order of the documents, each time its view is
+refreshed. Pressing enter on a line of the listing goes to the match on that line.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor, wait
+from os import cpu_count
+
+from . import commands, document, patterns
+from .document import Document
+from .selection import Selection, Interval
+from .textarray import textarray
+
+# The search whose matches are listed in a document, if any
+Document.documentsearch = None
+
+
+class DocumentSearch:
+
+    """The search of a pattern in the texts of a list of documents."""
+
+    def __init__(self, regex, documents, results):
+        self.regex = regex
+        self.results = results
+        # The matches that are listed, as the document, its revision at the
+        # start of the search and the interval of the match
+        self.entries = []
+        self.revisions = [doc.revision for doc in documents]
+        self.documents = documents
+        # Number of documents of which the matches are listed
+        self.listed = 0
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(len(documents),
+                                                             cpu_count() or 1)))
+        self.futures = [executor.submit(find_matches, regex, doc.text, name(doc))
+                        for doc in documents]
+        # The submitted searches are finished nevertheless
+        executor.shutdown(wait=False)
+
+        results.OnRefreshView.add(self.sync)
+
+    @property
+    def done(self):
+        return self.listed == len(self.futures)
+
+    def sync(self, doc=None):
+        """List the matches of the documents that have been searched."""
+        if self.done:
+            return
+
+        lines = []
+        while not self.done and self.futures[self.listed].done():
+            target = self.documents[self.listed]
+            revision = self.revisions[self.listed]
+            for interval, line in self.futures[self.listed].result():
+                self.entries.append((target, revision, interval))
+                lines.append(line + '\n')
+            self.listed += 1
+
+        if lines:
+            self.results.text += ''.join(lines)
+            self.results.saved = True
+        if self.done:
+            self.results.ui.notify('{} matches of {} in {} documents'.format(
+                len(self.entries), self.regex.pattern, len(self.documents)))
+
+    def wait(self, timeout=None):
+        """
+        Wait until all documents have been searched, and list the matches.
+        Return whether this succeeded within timeout seconds.
+        """
+        wait(self.futures, timeout)
+        self.sync()
+        return self.done
+
+
+def find_matches(regex, text, name):
+    """
+    Return the intervals of the matches of regex in text, together with the lines
+    that list them. This is called by the worker threads.
+    """
+    result = []
+    line = 0
+    pos = 0
+    for match in regex.finditer(text):
+        beg, end = match.span()
+        line += text.count('\n', pos, beg)
+        pos = beg
+        linestart = text.rfind('\n', 0, beg) + 1
+        lineend = text.find('\n', beg)
+        if lineend == -1:
+            lineend = len(text)
+        result.append((Interval(beg, end), '{}:{}:{}: {}'.format(
+            name, line + 1, beg - linestart + 1, text[linestart:lineend])))
+    return result
+
+
+def name(doc):
+    return doc.filename or '[untitled {}]'.format(document.documentlist.index(doc))
+
+
+def start_search(pattern):
+    """
+    Search pattern in all open documents, except listings of searches, and list
+    the matches in a new document, which is activated. Return the search.
+    """
+    regex = patterns.compile(pattern)
+    documents = [doc for doc in document.documentlist if doc.documentsearch == None]
+    results = Document()
+    results.documentsearch = DocumentSearch(regex, documents, results)
+    results.modes.normalmode.keymap['\n'] = commands.goto_search_result
+    results.activate()
+    return results.documentsearch
+
+
+def search_documents(doc):
+    """Ask for a pattern and search it in all open documents."""
+    def start(doc):
+        prompt = doc.modes.prompt
+        pattern = prompt.inputstring or doc.search_pattern
+        if prompt.cancelled or not pattern:
+            return
+        try:
+            start_search(pattern)
+        except re.error as e:
+            doc.ui.notify(str(e))
+    doc.modes.prompt.start(doc, 'Search documents: ', callback=start)
+commands.search_documents = search_documents
+
+
+def goto_search_result(doc):
+    """Go to the match that is listed on the line of the selection."""
+    search = doc.documentsearch
+    if search == None:
+        return
+    search.sync()
+    try:
+        target, revision, interval = search.entries[textarray(doc).line_of(
+            doc.selection[0][0])]
+    except IndexError:
+        return
+
+    if not target in document.documentlist:
+        doc.ui.notify('The document of this match has been closed')
+        return
+    if interval[1] > len(target.text):
+        doc.ui.notify('The document of this match has changed too much')
+        return
+    target.activate()
+    target.selection = Selection(interval)
+    if target.revision != revision:
+        target.ui.notify('The document has changed since the search')
+commands.goto_search_result = goto_search_result
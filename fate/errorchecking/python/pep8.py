@@ -33,7 +33,7 @@ class Pep8Checker(ErrorChecker):
                 line = int(match[1]) - 1 # Our line numbering starts with 0
                 column = int(match[2]) - 1 # Our column numbering starts with 0
                 message = match[3]
-                beg = coord_to_position(line, column, document.text, crop=True)
+                beg = coord_to_position(line, column, document, crop=True)
                 result.append(('error', Interval(beg, beg + 1), message))
         return result
 
@@ -38,9 +38,9 @@ class PythonChecker(ErrorChecker):
             else:
                 line = int(match[1]) - 1  # Our line numbering starts with 0
                 message = match[2]
-                beg = coord_to_position(line, 0, document.text)
+                beg = coord_to_position(line, 0, document)
                 try:
-                    end = coord_to_position(line + 1, 0, document.text) - 1
+                    end = coord_to_position(line + 1, 0, document) - 1
                 except ValueError:
                     end = len(document.text)
                 result.append(('error', Interval(beg, end), message))
@@ -0,0 +1,190 @@
+"""
+This module divides text into grapheme clusters, i.e. the characters as the
+user perceives them, such as a letter followed by combining accents, an emoji
+with a skin tone modifier, a sequence of emoji joined by zero width joiners,
+or a flag consisting of two regional indicators.
+
+The segmentation follows the rules for extended grapheme clusters of Unicode
+Standard Annex #29, using the character properties that are available from
+unicodedata, with an approximation of the set of pictographic characters.
+Whether two characters are separated by a boundary depends only on these two
+characters, unless the first is a zero width joiner or a regional indicator.
+Segmentation can start at any other boundary without looking further back, so
+the boundaries around a position are found by segmenting from the nearest such
+safe boundary before it, instead of from the start of its line.
+"""
+import unicodedata
+from functools import lru_cache
+
+CR, LF, CONTROL, EXTEND, ZWJ, REGIONAL_INDICATOR, SPACINGMARK = range(7)
+L, V, T, LV, LVT, PICTOGRAPHIC, OTHER = range(7, 14)
+
+# Ranges of code points that are (mostly) extended pictographic
+PICTOGRAPHIC_RANGES = [(0x00A9, 0x00A9), (0x00AE, 0x00AE), (0x203C, 0x203C),
+                       (0x2049, 0x2049), (0x2122, 0x2122), (0x2139, 0x2139),
+                       (0x2194, 0x21AA), (0x231A, 0x23FF), (0x24C2, 0x24C2),
+                       (0x25AA, 0x25FE), (0x2600, 0x27BF), (0x2934, 0x2935),
+                       (0x2B05, 0x2B55), (0x3030, 0x3030), (0x303D, 0x303D),
+                       (0x3297, 0x3299), (0x1F000, 0x1F1E5), (0x1F200, 0x1F3FA),
+                       (0x1F400, 0x1FAFF)]
+
+@lru_cache(maxsize=4096)
+def property_of(char):
+    """Return the grapheme cluster break property of char."""
+    if char == '\r':
+        return CR
+    if char == '\n':
+        return LF
+    code = ord(char)
+    if code == 0x200D:
+        return ZWJ
+    if 0x1F1E6 <= code <= 0x1F1FF:
+        return REGIONAL_INDICATOR
+    if 0x1F3FB <= code <= 0x1F3FF or code == 0x200C or 0xE0020 <= code <= 0xE007F:
+        # Emoji modifiers, zero width non joiner and tags
+        return EXTEND
+    if 0x1100 <= code <= 0x115F or 0xA960 <= code <= 0xA97C:
+        return L
+    if 0x1160 <= code <= 0x11A7 or 0xD7B0 <= code <= 0xD7C6:
+        return V
+    if 0x11A8 <= code <= 0x11FF or 0xD7CB <= code <= 0xD7FB:
+        return T
+    if 0xAC00 <= code <= 0xD7A3:
+        return LV if (code - 0xAC00) % 28 == 0 else LVT
+
+    category = unicodedata.category(char)
+    if category in ('Mn', 'Me'):
+        return EXTEND
+    if category == 'Mc':
+        return SPACINGMARK
+    if category in ('Cc', 'Cf', 'Zl', 'Zp', 'Cs'):
+        return CONTROL
+    for beg, end in PICTOGRAPHIC_RANGES:
+        if beg <= code <= end:
+            return PICTOGRAPHIC
+    return OTHER
+
+
+def segment(line):
+    """Return the list of cluster boundaries in line, including 0 and len(line)."""
+    return [0] + list(boundaries_from(line, 0))
+
+
+def boundaries_from(text, pos):
+    """
+    Generate the cluster boundaries in text after pos, including len(text),
+    where pos must be a safe boundary.
+    """
+    previous = None
+    # Whether we are in a pictographic character followed by extenders
+    in_pictographic = False
+    regional_indicators = 0
+    for i in range(pos, len(text)):
+        prop = property_of(text[i])
+        if previous != None and is_boundary(previous, prop, in_pictographic,
+                                            regional_indicators):
+            yield i
+
+        if prop == PICTOGRAPHIC:
+            in_pictographic = True
+        elif prop not in (EXTEND, ZWJ):
+            in_pictographic = False
+        if prop == REGIONAL_INDICATOR:
+            regional_indicators += 1
+        else:
+            regional_indicators = 0
+        previous = prop
+    if pos < len(text):
+        yield len(text)
+
+
+def is_safe_boundary(text, pos):
+    """
+    Check if there is a cluster boundary at pos, that doesn't depend on the
+    characters before pos - 1.
+    """
+    if pos <= 0 or pos >= len(text):
+        return True
+    previous = property_of(text[pos - 1])
+    return (previous not in (ZWJ, REGIONAL_INDICATOR)
+            and is_boundary(previous, property_of(text[pos]), False, 0))
+
+
+def safe_boundary(text, pos):
+    """Return the last safe boundary at or before pos."""
+    while not is_safe_boundary(text, pos):
+        pos -= 1
+    return pos
+
+
+def is_boundary(previous, prop, in_pictographic, regional_indicators):
+    """Check if there is a cluster boundary between two characters."""
+    if previous == CR and prop == LF:
+        return False
+    if previous in (CR, LF, CONTROL) or prop in (CR, LF, CONTROL):
+        return True
+    # Hangul syllables
+    if previous == L and prop in (L, V, LV, LVT):
+        return False
+    if previous in (LV, V) and prop in (V, T):
+        return False
+    if previous in (LVT, T) and prop == T:
+        return False
+    if prop in (EXTEND, ZWJ, SPACINGMARK):
+        return False
+    # Emoji joined by zero width joiners
+    if previous == ZWJ and prop == PICTOGRAPHIC and in_pictographic:
+        return False
+    # Flags consist of pairs of regional indicators
+    if previous == REGIONAL_INDICATOR and prop == REGIONAL_INDICATOR:
+        return regional_indicators % 2 == 0
+    return True
+
+
+def clusters(text, pos, reverse=False):
+    """
+    Generate the clusters of text as intervals (beg, end).
+    Forward, start at the last safe boundary at or before pos.
+    Backward, start with the last cluster starting at or before pos.
+    """
+    pos = min(pos, len(text))
+    if not reverse:
+        beg = safe_boundary(text, pos)
+        for end in boundaries_from(text, beg):
+            yield beg, end
+            beg = end
+    else:
+        # Segment forward from safe boundaries, one stretch before the other
+        end = next_boundary(text, pos)
+        while end > 0:
+            beg = safe_boundary(text, end - 1)
+            boundaries = [beg]
+            for boundary in boundaries_from(text, beg):
+                boundaries.append(boundary)
+                if boundary == end:
+                    break
+            for i in range(len(boundaries) - 2, -1, -1):
+                if boundaries[i] <= pos:
+                    yield boundaries[i], boundaries[i + 1]
+            end = beg
+
+
+def previous_boundary(text, pos):
+    """Return the last cluster boundary before pos, or 0."""
+    if pos <= 0:
+        return 0
+    result = beg = safe_boundary(text, pos - 1)
+    for boundary in boundaries_from(text, beg):
+        if boundary >= pos:
+            break
+        result = boundary
+    return result
+
+
+def next_boundary(text, pos):
+    """Return the first cluster boundary after pos, or len(text)."""
+    if pos >= len(text):
+        return len(text)
+    for boundary in boundaries_from(text, safe_boundary(text, pos)):
+        if boundary > pos:
+            return boundary
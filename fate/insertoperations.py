@@ -1,12 +1,13 @@
 """
 Module containing insertmode implementations.
 """
-import re
-from . import commands
+from . import commands, patterns
 from .operation import Operation
 from .operators import Append, Insert
 from .selection import Interval
+from .textslice import TextSlice
 from .commandtools import compose
+from .graphemes import previous_boundary, next_boundary
 from . import selecting  # Dependency
 from .selecting.selectpattern import selectfullline
 from . import commands
@@ -30,16 +31,57 @@ class InsertMode(Mode):
     def start(self, doc, *args, **kwargs):
         self.preview_operation = None
         Mode.start(self, doc, *args, **kwargs)
+        # The operations are computed against the text and selection at the start,
+        # regardless of the preview that is applied to the document
+        self.original_text = doc.text
+        self.original_selection = doc.selection
         self.update_operation(doc)
 
     def processinput(self, doc, userinput):
         if not Mode.processinput(self, doc, userinput):
-            self.insert_and_update(doc, userinput)
+            burst = []
+            if self.is_plain_key(doc, userinput):
+                # Take along the keys that are already waiting, e.g. because of a paste
+                burst = doc.ui.getinputburst(lambda key: self.is_plain_key(doc, key))
+            if burst:
+                self.insert_burst(doc, [userinput] + burst)
+            else:
+                self.insert_and_update(doc, userinput)
+
+    def is_plain_key(self, doc, userinput):
+        """Check if userinput is a single character that is inserted as text."""
+        if not isinstance(userinput, str) or len(userinput) != 1:
+            return False
+        if userinput in self.keymap:
+            return False
+        command = doc.modes.normalmode.keymap.get(userinput)
+        return command == None or not command in self.allowedcommands
 
     def insert_and_update(self, doc, userinput):
         self.insert(doc, userinput)
         self.update_operation(doc)
 
+    def insert_burst(self, doc, keys):
+        """
+        Insert a burst of keys while updating the preview only once.
+        Runs of ordinary characters are inserted as a single string.
+        """
+        strings = []
+        for key in keys:
+            if key in '\b\n\t' or not strings or strings[-1] in '\b\n\t':
+                strings.append(key)
+            else:
+                strings[-1] += key
+
+        outdated = False
+        for string in strings:
+            # Autoindentation reads the indent from the previewed text
+            if string == '\n' and doc.autoindent and outdated:
+                self.update_operation(doc)
+            self.insert(doc, string)
+            outdated = True
+        self.update_operation(doc)
+
     def stop(self, doc):
         if self.preview_operation != None:
             self.preview_operation.undo(doc)
@@ -47,13 +89,27 @@ class InsertMode(Mode):
         Mode.stop(self, doc)
 
     def update_operation(self, doc):
-        # TODO: this is gonna be easier if text allows preview operations
-        if self.preview_operation != None:
-            self.preview_operation.undo(doc)
+        operation = self.compute_operation(doc)
 
         # Execute the operation (excludes adding it to the undotree)
-        self.preview_operation = self.compute_operation(doc)
-        self.preview_operation.do(doc)
+        if self.preview_operation == None:
+            operation.do(doc)
+        else:
+            # Only apply the difference with the previous preview, which takes a
+            # single splice instead of undoing the previous preview and applying
+            # the new one
+            delta = self.preview_operation.inverse().compose(operation)
+            delta.do(doc)
+        self.preview_operation = operation
+
+    def create_operation(self, newcontent, selection=None):
+        """
+        Create an operation on the original text, which is still valid while
+        a preview is applied to the document.
+        """
+        selection = selection or self.original_selection
+        old_content = [TextSlice(self.original_text, beg, end) for beg, end in selection]
+        return Operation.from_content(selection, old_content, newcontent)
 
     @abstractmethod
     def compute_operation(self, doc):
@@ -72,7 +128,7 @@ def get_indent(doc, pos):
     """Get the indentation of the line containing position pos."""
     line = selectfullline(doc, interval=Interval(pos, pos))
     string = line.content(doc)
-    match = re.search(r'^[ \t]*', string)
+    match = patterns.compile(r'^[ \t]*').search(string)
     assert match.start() == 0
     return string[match.start(): match.end()]
 
@@ -97,17 +153,20 @@ class ChangeInPlace(InsertMode):
                 # TODO remove multiple whitespaces if possible and doc.expandtab is True
                 if self.newcontent[i]:
                     # Remove one char
-                    self.newcontent[i] = self.newcontent[i][:-1]
+                    content = self.newcontent[i]
+                    self.newcontent[i] = content[:previous_boundary(content, len(content))]
                 else:
                     # Extend selection, automatically removing a character, since
                     # newcontent[i] is empty
                     beg, end = self.oldselection[i]
-                    self.oldselection[i] = Interval(max(0, beg - 1), end)
+                    beg = previous_boundary(self.original_text, beg)
+                    self.oldselection[i] = Interval(beg, end)
             elif string == 'del':
                 # Extend selection, automatically removing a character, since
                 # the new character is not in newcontent[i]
                 beg, end = self.oldselection[i]
-                self.oldselection[i] = Interval(beg, min(len(doc.text), end + 1))
+                end = min(len(self.original_text), next_boundary(self.original_text, end))
+                self.oldselection[i] = Interval(beg, end)
             elif string == '\n' and doc.autoindent:
                 # Add indent after \n
                 newselection = self.preview_operation.compute_newselection()
@@ -129,7 +188,7 @@ class ChangeInPlace(InsertMode):
         newcontent = [doc.selection.content(doc)[i % l][:-self.deletions[i % l] or None]
                        + self.insertions[i % l] for i in range(len(doc.selection))]
         """
-        return Operation(doc, self.newcontent[:], deepcopy(self.oldselection))
+        return self.create_operation(self.newcontent[:], deepcopy(self.oldselection))
 
 
 def init_changeinplace(doc):
@@ -205,8 +264,10 @@ class ChangeAround(InsertMode):
         # Therefore we take indices modulo the length of the lists
         l = len(self.insertions_after)
         character_pairs = [('{', '}'), ('[', ']'), ('(', ')'), ('<', '>')]
+        content = [TextSlice(self.original_text, beg, end)
+                   for beg, end in self.original_selection]
         newcontent = []
-        for i in range(len(doc.selection)):
+        for i in range(len(self.original_selection)):
             first_string = self.insertions_before[i % l][::-1]
             second_string = self.insertions_after[i % l]
             for first, second in character_pairs:
@@ -214,10 +275,8 @@ class ChangeAround(InsertMode):
                 second_string = second_string.replace(first, second)
 
             beg, end = self.deletions[i % l], -self.deletions[i % l] or None
-            newcontent.append(first_string
-                              + doc.selection.content(doc)[i % l][beg:end]
-                              + second_string)
-        return Operation(doc, newcontent)
+            newcontent.append(first_string + content[i % l][beg:end] + second_string)
+        return self.create_operation(newcontent)
 
 
 def init_changearound(doc):
@@ -0,0 +1,167 @@
+"""
+This module provides macros, i.e. sequences of user input that are recorded in a
+named register and can be played back any number of times.
+
+Press q followed by a register name to start recording, and q again to stop.
+Press @ followed by a register name to play the macro in that register,
+optionally preceded by a count.
+
+While recording, the keys that normal mode turns into commands are stored together
+with these commands, so that playing a macro doesn't have to look them up again.
+The other input, e.g. the text typed in insert mode or a key asked for by a command,
+is stored as is, and is fed to the document again when the macro is played.
+A macro is played inside a single transaction, without refreshing the view in
+between, so the view and plugins are only updated once afterwards.
+All edits of a macro are undone at once, unless the macro moves through the
+undotree itself, or plays other macros, which might do so.
+"""
+from logging import debug
+
+from . import commands
+from .document import Document
+
+
+class MacroCommand:
+
+    """A command as normal mode executed it, followed by the input it consumed."""
+
+    def __init__(self, command, count, keys):
+        self.command = command
+        self.count = count
+        # The keys that were turned into the command
+        self.keys = keys
+        # The input that followed until the next command
+        self.inputs = []
+
+
+class MacroData:
+
+    """A container object for the registers and the recording state."""
+
+    def __init__(self):
+        self.registers = {}
+        # Name of the register that is being recorded, or None
+        self.recording = None
+        # Input that is recorded before the first command
+        self.inputs = []
+        self.steps = []
+        # Names of the registers that are being played
+        self.playing = []
+
+
+def init(doc):
+    doc.ui.OnUserInput.add(record_input)
+    doc.modes.normalmode.OnCommand.add(record_command)
+    doc.ui.macro_data = MacroData()
+
+Document.OnDocumentInit.add(init)
+
+
+def record_input(ui, userinput):
+    """Handler for OnUserInput."""
+    data = ui.macro_data
+    if data.recording != None and not data.playing:
+        if data.steps:
+            data.steps[-1].inputs.append(userinput)
+        else:
+            data.inputs.append(userinput)
+
+
+def record_command(doc, command, count):
+    """Handler for OnCommand of normal mode."""
+    data = doc.ui.macro_data
+    if data.recording == None or data.playing:
+        return
+
+    # The keys of the command, including the count prefix, have just been recorded
+    # as input, so they are taken back
+    nr_keys = 1 + (len(str(count)) if count != None else 0)
+    inputs = data.steps[-1].inputs if data.steps else data.inputs
+    keys = inputs[len(inputs) - nr_keys:]
+    del inputs[len(inputs) - nr_keys:]
+    data.steps.append(MacroCommand(command, count, keys))
+
+
+def record_macro(doc):
+    """Start recording in the register given by the next key, or stop recording."""
+    data = doc.ui.macro_data
+    if data.recording != None:
+        # The command stopping the recording is not part of the macro
+        if data.steps and data.steps[-1].command is record_macro:
+            data.steps.pop()
+        data.registers[data.recording] = (data.inputs, data.steps)
+        message = 'Recorded macro in register ' + data.recording
+        data.recording = None
+        debug(message)
+        doc.ui.notify(message)
+        return
+
+    register = doc.ui.getkey()
+    if register == doc.cancelkey:
+        return
+    data.recording = register
+    data.inputs = []
+    data.steps = []
+    doc.ui.notify('Recording macro in register ' + register)
+commands.record_macro = record_macro
+
+
+def play_macro(doc, count=1):
+    """Play the macro in the register given by the next key count times."""
+    data = doc.ui.macro_data
+    register = doc.ui.getkey()
+    if not register in data.registers:
+        doc.ui.notify('Register {} is empty'.format(register))
+        return
+    if register in data.playing:
+        doc.ui.notify('Macro in register {} is already playing'.format(register))
+        return
+
+    inputs, steps = data.registers[register]
+    group_undo = not any(step.command in (commands.undo, commands.redo,
+                                          commands.undomode, play_macro)
+                         for step in steps)
+    data.playing.append(register)
+    try:
+        with doc.transaction(group_undo):
+            for _ in range(count):
+                play(doc, inputs, steps)
+    finally:
+        data.playing.pop()
+play_macro.counted = lambda doc, count: play_macro(doc, count)
+commands.play_macro = play_macro
+
+
+def play(doc, inputs, steps):
+    """Execute the recorded commands and feed the recorded input to the document."""
+    process(doc, inputs)
+    normalmode = doc.modes.normalmode
+    for step in steps:
+        if doc.mode is normalmode:
+            # Input that is asked for by the command must be available beforehand
+            command = step.command
+            if step.count != None:
+                command = normalmode.counted_command(command, step.count)
+            process(doc, step.inputs, lambda: execute(doc, command))
+        else:
+            # The document went another way than during recording
+            process(doc, step.keys + step.inputs)
+
+
+def execute(doc, command):
+    while callable(command):
+        command = command(doc)
+
+
+def process(doc, inputs, before=None):
+    """
+    Put inputs in front of the input queue, call before if given, and let the
+    document process the inputs that are still left.
+    """
+    queue = doc.ui.inputqueue
+    size = len(queue)
+    queue.extend(reversed(inputs))
+    if before != None:
+        before()
+    while len(queue) > size:
+        doc.processinput(doc.ui.getinput())
@@ -5,6 +5,7 @@ from . import commands
 from logging import debug
 
 from .contract import pre, post
+from .textarray import textarray
 
 
 def movehalfpagedown(doc):
@@ -133,16 +134,31 @@ def move_n_wrapped_lines_down(text: str, max_line_width: int, start: int, n: int
 
 
 def coord_to_position(line, column, text, crop=False):
-    pos = 0
-    while line > 1:  # line numbers start with 1
-        eol = text.find('\n', pos)
-        if eol == -1:
+    """
+    Return the position at line and column, which both start at 1.
+    Instead of a string, text can be a document, in which case the line starts are
+    looked up in its text array instead of scanning the text.
+    """
+    line = max(line, 1)  # line numbers start with 1
+    if isinstance(text, str):
+        pos = 0
+        while line > 1:
+            eol = text.find('\n', pos)
+            if eol == -1:
+                if crop:
+                    return len(text) - 1
+                raise ValueError('Line number reaches beyond text.')
+
+            pos = eol + 1
+            line -= 1
+    else:
+        lines = textarray(text)
+        text = text.text
+        if line > lines.count_newlines() + 1:
             if crop:
                 return len(text) - 1
             raise ValueError('Line number reaches beyond text.')
-
-        pos = eol + 1
-        line -= 1
+        pos = lines.line_start(line - 1)
 
     pos += column - 1  # column numbers start with 1
     if pos >= len(text) and not crop:
@@ -154,18 +170,29 @@ def coord_to_position(line, column, text, crop=False):
 
 
 def position_to_coord(pos, text):
-    if pos >= len(text):
-        raise ValueError('Position reaches beyond text.')
-
-    i = 0  # First character of current line
-    line = 1  # Line numbers start with 1
-    while i < pos:
-        eol = text.find('\n', i)
-        if eol >= pos:
-            break
-        else:
+    """
+    Return the line and column of pos, which both start at 1.
+    Like for coord_to_position, text can be a string or a document.
+    """
+    if isinstance(text, str):
+        if pos >= len(text):
+            raise ValueError('Position reaches beyond text.')
+
+        i = 0  # First character of current line
+        line = 1  # Line numbers start with 1
+        while i < pos:
+            eol = text.find('\n', i)
+            if eol == -1 or eol >= pos:
+                break
             line += 1
             i = eol + 1
+    else:
+        if pos >= len(text.text):
+            raise ValueError('Position reaches beyond text.')
+
+        lines = textarray(text)
+        line = lines.line_of(pos) + 1  # Line numbers start with 1
+        i = lines.line_start(line - 1)
     column = pos - i + 1  # Column numbers start with 1
 
     assert pos == coord_to_position(line, column, text)
@@ -2,6 +2,7 @@ from .mode import Mode, input_to_command
 from .document import Document
 from . import pointer
 from . import commands
+from .event import Event
 
 from copy import copy
 import logging
@@ -27,6 +28,7 @@ default_keymap = {
     'ctrl-x': commands.force_quit,
     'ctrl-o': commands.open_file,
     'ctrl-n': commands.next_document,
+    'ctrl-g': commands.search_documents,
     'ctrl-p': commands.previous_document,
     'f3': commands.formattext,
     'f4': commands.checkerrors,
@@ -85,6 +87,8 @@ default_keymap = {
     'x': commands.cut,
     'X': commands.cutchange,
     '.': commands.repeat,
+    'q': commands.record_macro,
+    '@': commands.play_macro,
     '~': commands.uppercase,
     '`': commands.lowercase,
     'ctrl-f': commands.movepagedown,
@@ -101,6 +105,10 @@ class NormalMode(Mode):
     def __init__(self, doc):
         Mode.__init__(self, doc)
         self.keymap = copy(default_keymap)
+        # Count prefix that is being typed, e.g. 500 in 500j
+        self.count = None
+        # Fired with the command and the count just before a command is executed
+        self.OnCommand = Event('OnCommand')
 
     def start(self, doc, callback=None):
         """Must be called to start the mode."""
@@ -120,11 +128,36 @@ class NormalMode(Mode):
     def processinput(self, doc, userinput):
         if isinstance(userinput, pointer.PointerInput):
             self.process_pointerinput(userinput)
+        elif self.is_countinput(userinput):
+            self.count = (self.count or 0) * 10 + int(userinput)
         else:
+            count, self.count = self.count, None
             command = input_to_command(self.doc, userinput)
+            if command != None:
+                self.OnCommand.fire(self.doc, command, count)
+            if count != None:
+                command = self.counted_command(command, count)
             while callable(command):
                 command = command(self.doc)
 
+    def is_countinput(self, userinput):
+        """Check if userinput is a digit of a count prefix."""
+        return (isinstance(userinput, str) and len(userinput) == 1
+                and userinput in '0123456789' and not userinput in self.keymap
+                and (userinput != '0' or self.count != None))
+
+    def counted_command(self, command, count):
+        """
+        Return the command that executes command count times.
+        Commands that have a counted version, like most motions, get there at once.
+        Other commands ignore the count.
+        """
+        counted = getattr(command, 'counted', None)
+        if counted == None:
+            logging.debug('Command {} does not take a count'.format(command))
+            return command
+        return lambda doc: counted(doc, count)
+
     def process_pointerinput(self, userinput):
         assert isinstance(userinput, pointer.PointerInput)
 
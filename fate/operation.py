@@ -11,14 +11,30 @@ class Operation(Undoable):
     The members are `oldselection`, `old_content`, `newcontent`.
     The property `newselection` is only available after the operation
     has been applied.
+    The old content is stored lazily, so it costs no memory until it is read.
+
+    Operations can be composed into a single equivalent operation.
+    A composed operation remembers the selections that the sequence of operations
+    it was composed of would leave behind, in `selection_before` and `selection_after`.
     """
+    selection_before = None
+    selection_after = None
 
     def __init__(self, doc, newcontent, selection=None):
         selection = selection or doc.selection
         self.oldselection = selection
-        self.old_content = selection.content(doc)
+        self.old_content = selection.content(doc, lazy=True)
         self.newcontent = newcontent
 
+    @classmethod
+    def from_content(cls, oldselection, old_content, newcontent):
+        """Create an operation directly from its members, without a document."""
+        operation = cls.__new__(cls)
+        operation.oldselection = oldselection
+        operation.old_content = old_content
+        operation.newcontent = newcontent
+        return operation
+
     def __str__(self):
         attributes = [('oldselection', self.oldselection),
                       ('computed newselection', self.compute_newselection()),
@@ -37,6 +53,103 @@ class Operation(Undoable):
             result.add(Interval(beg, end))
         return result
 
+    def initial_selection(self):
+        """The selection that undoing the operation leaves behind."""
+        return self.selection_before or self.oldselection
+
+    def final_selection(self):
+        """The selection that applying the operation leaves behind."""
+        return self.selection_after or self.compute_newselection()
+
+    def inverse(self):
+        """Return the operation that undoes self."""
+        result = Operation.from_content(self.compute_newselection(),
+                                        self.newcontent, self.old_content)
+        result.selection_before = self.final_selection()
+        result.selection_after = self.initial_selection()
+        return result
+
+    def compose(self, other):
+        """
+        Return a single operation that is equivalent to applying self and then other.
+        Modified intervals of both operations that overlap or touch are merged,
+        so that the result can be applied with a single splice of the text.
+        """
+        # Both the intervals of the newselection of self and the intervals of the
+        # oldselection of other are positions in the intermediate text
+        # Each piece is (beg, end, from_self, index)
+        pieces = [(beg, end, True, i)
+                  for i, (beg, end) in enumerate(self.compute_newselection())]
+        pieces.extend((beg, end, False, i)
+                      for i, (beg, end) in enumerate(other.oldselection))
+        pieces.sort(key=lambda piece: (piece[0], piece[1]))
+
+        # Group pieces whose union is contiguous
+        groups = []
+        group_end = -1
+        for piece in pieces:
+            if groups and piece[0] <= group_end:
+                groups[-1].append(piece)
+                group_end = max(group_end, piece[1])
+            else:
+                groups.append([piece])
+                group_end = piece[1]
+
+        intervals = []
+        old_content = []
+        newcontent = []
+        shift = 0  # Difference in length between the intermediate and the old text
+        for group in groups:
+            old, new = self._compose_group(other, group)
+            beg = group[0][0] - shift
+            intervals.append(Interval(beg, beg + len(old)))
+            old_content.append(old)
+            newcontent.append(new)
+            shift += sum(len(self.newcontent[i]) - len(self.old_content[i])
+                         for _, _, from_self, i in group if from_self)
+
+        result = Operation.from_content(Selection(intervals), old_content, newcontent)
+        result.selection_before = self.initial_selection()
+        result.selection_after = other.final_selection()
+        return result
+
+    def _compose_group(self, other, group):
+        """
+        Return the old and the new content of a group of contiguous pieces
+        in the intermediate text.
+        """
+        # A group with a single piece can keep its (possibly lazy) content
+        if len(group) == 1:
+            _, _, from_self, i = group[0]
+            if from_self:
+                return self.old_content[i], self.newcontent[i]
+            return other.old_content[i], other.newcontent[i]
+
+        # Reconstruct the intermediate content of the group from the pieces
+        gbeg = group[0][0]
+        intermediate = []
+        pos = gbeg
+        for beg, end, from_self, i in group:
+            if end > pos:
+                content = self.newcontent[i] if from_self else other.old_content[i]
+                intermediate.append(str(content)[pos - beg:])
+                pos = end
+        intermediate = ''.join(intermediate)
+
+        def splice(from_self, contents):
+            """Replace the pieces of one of the operations in the intermediate content."""
+            result = []
+            pos = gbeg
+            for beg, end, piece_from_self, i in group:
+                if piece_from_self == from_self:
+                    result.append(intermediate[pos - gbeg:beg - gbeg])
+                    result.append(str(contents[i]))
+                    pos = end
+            result.append(intermediate[pos - gbeg:])
+            return ''.join(result)
+
+        return splice(True, self.old_content), splice(False, other.newcontent)
+
     def do(self, doc):
         """Execute operation."""
         self._apply(doc)
@@ -51,10 +164,12 @@ class Operation(Undoable):
             oldselection = self.compute_newselection()
             newselection = self.oldselection
             newcontent = self.old_content
+            resultselection = self.initial_selection()
         else:
             newselection = self.compute_newselection()
             oldselection = self.oldselection
             newcontent = self.newcontent
+            resultselection = self.final_selection()
 
         # Make sure the application of this operation is valid at this moment
         oldselection.validate(doc)
@@ -69,11 +184,31 @@ class Operation(Undoable):
         result = []
         for in_selection, string in partition_content:
             if in_selection:
-                result.append(newcontent[count])
+                # The content may be lazy, so materialise it
+                result.append(str(newcontent[count]))
                 count += 1
             else:
                 result.append(string)
 
-        doc.text = ''.join(result)
-        doc.selection = newselection
+        newtext = ''.join(result)
+        doc.OnApplyOperation.fire(doc, self.inverse() if inverse else self,
+                                  doc.text, newtext)
+        doc.text = newtext
+        doc.selection = resultselection
+
+
+def compose_operations(operations):
+    """
+    Compose a nonempty list of operations into a single operation.
+    Operations are composed pairwise, so that composing many operations that each
+    modify a different part of the text does not take quadratic time.
+    """
+    operations = list(operations)
+    while len(operations) > 1:
+        composed = [first.compose(second)
+                    for first, second in zip(operations[::2], operations[1::2])]
+        if len(operations) % 2:
+            composed.append(operations[-1])
+        operations = composed
+    return operations[0]
 
@@ -0,0 +1,110 @@
+"""
+This module contains the registry of compiled regular expressions that fate uses.
+
+Patterns are given as strings by many parts of fate, e.g. the selectors, search,
+local find and highlighting. Compiling them every time is wasteful, and the internal
+cache of the re module is small and shared with everything else, so heavy use of
+searching would evict the patterns of the motions.
+Therefore all patterns are compiled through this registry, which keeps the least
+recently used patterns up to a configurable size, and counts how often it can reuse
+a compiled pattern.
+The patterns of the built-in selectors are compiled once at import and are never
+evicted.
+"""
+import re
+from collections import OrderedDict
+
+from . import commands
+
+
+class PatternRegistry:
+
+    """Cache of compiled patterns with least recently used eviction."""
+    maxsize = 512
+
+    def __init__(self, maxsize=None):
+        if maxsize != None:
+            self.maxsize = maxsize
+        self.regexes = OrderedDict()
+        # Patterns that are never evicted
+        self.pinned = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compile(self, pattern, flags=0):
+        """Return the compiled regular expression for pattern."""
+        if not isinstance(pattern, str):
+            # Already compiled
+            return pattern
+
+        key = (pattern, flags)
+        try:
+            regex = self.pinned[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            return regex
+
+        try:
+            regex = self.regexes[key]
+        except KeyError:
+            self.misses += 1
+            # Invalid patterns raise re.error here, and are not stored
+            regex = self.regexes[key] = re.compile(pattern, flags)
+            self.shrink()
+            return regex
+        self.hits += 1
+        self.regexes.move_to_end(key)
+        return regex
+
+    def precompile(self, patterns, flags=0):
+        """Compile given patterns and keep them for good."""
+        for pattern in patterns:
+            key = (pattern, flags)
+            if not key in self.pinned:
+                self.regexes.pop(key, None)
+                self.pinned[key] = re.compile(pattern, flags)
+
+    def resize(self, maxsize):
+        """Change the number of patterns that are kept apart from the pinned ones."""
+        self.maxsize = maxsize
+        self.shrink()
+
+    def shrink(self):
+        while len(self.regexes) > self.maxsize:
+            self.regexes.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self):
+        """Return the fraction of lookups that reused a compiled pattern."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0
+
+    def statistics(self):
+        return ('{} patterns cached ({} pinned), {} hits, {} misses, {} evictions, '
+                'hit rate {:.1%}'.format(len(self.regexes) + len(self.pinned),
+                                         len(self.pinned), self.hits, self.misses,
+                                         self.evictions, self.hit_rate))
+
+    def clear(self):
+        self.regexes.clear()
+
+registry = PatternRegistry()
+
+
+def compile(pattern, flags=0):
+    """Return the compiled regular expression for pattern from the registry."""
+    return registry.compile(pattern, flags)
+
+
+def precompile(patterns, flags=0):
+    registry.precompile(patterns, flags)
+
+
+def pattern_statistics(doc):
+    """Show the statistics of the pattern registry."""
+    doc.ui.notify(registry.statistics())
+commands.pattern_statistics = pattern_statistics
@@ -6,14 +6,19 @@ class Prompt(Mode):
     def __init__(self, doc):
         Mode.__init__(self, doc)
         self.inputstring = ''
+        # Whether the prompt was stopped by the cancel key
+        self.cancelled = False
 
     def processinput(self, doc, userinput):
         if isinstance(userinput, str):
             key = userinput
             if key == doc.cancelkey:
+                self.cancelled = True
                 self.stop(doc)
             elif key == '\n':
                 self.stop(doc)
+            elif key == '\b':
+                self.inputstring = self.inputstring[:-1]
             elif len(key) > 1:
                 debug('Search key {} not supported.'.format(key))
             else:
@@ -23,6 +28,7 @@ class Prompt(Mode):
 
     def start(self, doc, promptstring='>', callback=None):
         self.inputstring = ''
+        self.cancelled = False
         self.promptstring = promptstring
         Mode.start(self, doc, callback)
 
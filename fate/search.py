@@ -1,70 +1,218 @@
 import re
 from . import commands
-from .selecting.selectpattern import selectpattern, select_local_pattern
+from .selection import Selection, Interval
+from .selecting.selectpattern import select_local_pattern
+from .selecting.matchindex import matchindex, line_local
 from .selecting.decorators import intervalselector_withmode
 from .document import Document
 from .commandtools import compose
+from .prompt import Prompt
+from . import patterns
 from functools import partial
 import logging
 
 Document.search_pattern = ''
 
 
+# The commands of local_find by key and direction
+local_find_commands = {}
+
+
+def local_find_command(key, reverse=False):
+    """
+    Return the command that selects the next (or previous) occurrence of key.
+    It is built only once for each key, such that the selector cache recognizes it.
+    """
+    try:
+        return local_find_commands[key, reverse]
+    except KeyError:
+        command = intervalselector_withmode(partial(select_local_pattern, re.escape(key),
+                                                    reverse=reverse))
+        local_find_commands[key, reverse] = command
+        return command
+
+
 def local_find(doc):
     key = doc.ui.getkey()
-    command = intervalselector_withmode(partial(select_local_pattern, re.escape(key)))
-    command(doc)
+    local_find_command(key)(doc)
 commands.local_find = local_find
 
 
 def local_find_backward(doc):
     key = doc.ui.getkey()
-    command = intervalselector_withmode(partial(select_local_pattern, re.escape(key),
-                                                reverse=True))
-    command(doc)
+    local_find_command(key, reverse=True)(doc)
 commands.local_find_backward = local_find_backward
 
 
-# TODO: fix search have correct promptstring
-# TODO: make searching work again
+# Number of characters that the preview searches before it checks for input
+CHUNK_SIZE = 1 << 16
+# Patterns without special characters
+LITERAL_REGEX = re.compile(r'[^.^$*+?{}\[\]\\|()]*')
+
+
+class SearchState:
+
+    """The progress of searching a pattern from the start of the prompt."""
+
+    def __init__(self, pattern, pos):
+        self.pattern = pattern
+        # No match starts between the start of the search and pos
+        self.pos = pos
+        self.interval = None
+        self.done = False
+
+
+class SearchPrompt(Prompt):
+
+    """
+    Prompt for the search pattern, which selects the first match from the selection
+    while the pattern is being typed.
+    The text is searched in chunks, and the search is abandoned as soon as the next key
+    arrives. It is continued for the next pattern if possible, so that typing is never
+    held up by searching a large text.
+    """
+
+    def start(self, doc, callback=None):
+        Prompt.start(self, doc, '/', callback)
+        self.original_selection = doc.selection
+        self.states = []
+
+    def processinput(self, doc, userinput):
+        if userinput == doc.cancelkey:
+            doc.selection = self.original_selection
+        Prompt.processinput(self, doc, userinput)
+        if doc.mode is self:
+            self.preview(doc)
+
+    def preview(self, doc):
+        state = self.state(self.inputstring)
+        if state.pattern and not state.done:
+            try:
+                self.search(doc, state, interruptible=True)
+            except re.error:
+                # The pattern is probably not finished yet
+                state.done = True
+        if state.interval != None:
+            doc.selection = Selection(state.interval)
+        else:
+            doc.selection = self.original_selection
+
+    def state(self, pattern):
+        """Return the search state of pattern, continuing from that of a prefix."""
+        # Typing backspace brings back the state of the shorter pattern
+        while self.states and not pattern.startswith(self.states[-1].pattern):
+            self.states.pop()
+        if self.states and self.states[-1].pattern == pattern:
+            return self.states[-1]
+
+        pos = self.original_selection[0][0]
+        if self.states and LITERAL_REGEX.fullmatch(pattern):
+            # Each match of pattern is also a match of the prefix
+            pos = self.states[-1].pos
+        state = SearchState(pattern, pos)
+        self.states.append(state)
+        return state
+
+    def search(self, doc, state, interruptible=False):
+        """
+        Search the first match from state.pos, until it is found or, if interruptible,
+        until input arrives.
+        """
+        text = doc.text
+        regex = patterns.compile(state.pattern)
+        while not state.done:
+            if interruptible and doc.ui.inputpending():
+                return
+            end = len(text)
+            if interruptible:
+                # Chunks end at the start of a line, such that they only cut off
+                # matches that span multiple lines
+                end = text.find('\n', state.pos + CHUNK_SIZE) + 1 or len(text)
+            match = regex.search(text, state.pos, end)
+            if match != None and (match.start() < end or end == len(text)):
+                state.pos = match.start()
+                state.interval = Interval(match.start(), match.end())
+                state.done = True
+            elif end == len(text):
+                state.pos = len(text) + 1
+                state.done = True
+            else:
+                state.pos = end
+
+    def result(self, doc):
+        """Return the first match of the pattern, without cutting the text in chunks."""
+        pattern = self.inputstring
+        state = self.state(pattern)
+        if not line_local(pattern):
+            state = SearchState(pattern, self.original_selection[0][0])
+        self.search(doc, state)
+        return state.interval
+
+
+def init_searchprompt(doc):
+    doc.modes.searchprompt = SearchPrompt(doc)
+Document.OnModeInit.add(init_searchprompt)
+
+
 def ask_search_string(doc):
-    doc.modes.prompt.promptstring = '/'
-    return doc.modes.prompt
+    return doc.modes.searchprompt
 def execute_search(doc):
-    doc.search_pattern = doc.modes.prompt.inputstring
+    prompt = doc.modes.searchprompt
+    if prompt.cancelled:
+        return
+    doc.search_pattern = prompt.inputstring
     logging.debug('Pattern: ' + doc.search_pattern)
     if doc.search_pattern:
         try:
-            command = selectpattern(doc.search_pattern, doc, doc.selection)
-            command(doc)
+            interval = prompt.result(doc)
         except re.error as e:
             doc.ui.notify(str(e))
+            return
+        if interval == None:
+            doc.selection = prompt.original_selection
+            doc.ui.notify('Pattern not found: ' + doc.search_pattern)
+        else:
+            doc.selection = Selection(interval)
 commands.search = compose(ask_search_string, execute_search)
 
 
 def search_current_content(doc):
     doc.search_pattern = re.escape(doc.selection.content(doc)[-1])
-    command = selectpattern(doc.search_pattern, doc, doc.selection)
-    command(doc)
+    select_match(doc)
 commands.search_current_content = search_current_content
 
 
 def search_next(doc):
     if doc.search_pattern:
-        try:
-            command = selectpattern(doc.search_pattern, doc, doc.selection)
-            command(doc)
-        except re.error as e:
-            doc.ui.notify(str(e))
+        select_match(doc)
 commands.search_next = search_next
 
 
 def search_previous(doc):
     if doc.search_pattern:
-        try:
-            command = selectpattern(doc.search_pattern,
-                                    doc, doc.selection, reverse=True)
-            command(doc)
-        except re.error as e:
-            doc.ui.notify(str(e))
+        select_match(doc, reverse=True)
 commands.search_previous = search_previous
+
+
+def select_match(doc, reverse=False):
+    """
+    Select the next (or previous) match of the search pattern, and tell which
+    match it is.
+    """
+    index = matchindex(doc)
+    try:
+        indices = index.select(doc.search_pattern, doc.selection, reverse)
+    except re.error as e:
+        doc.ui.notify(str(e))
+        return
+
+    total = len(index.starts)
+    if not total:
+        doc.ui.notify('Pattern not found: ' + doc.search_pattern)
+    elif indices:
+        doc.selection = Selection(index.intervals(indices))
+        if len(indices) == 1:
+            doc.ui.notify('Match {} of {}'.format(indices[0] + 1, total))
+        else:
+            doc.ui.notify('Matches {} to {} of {}'.format(indices[0] + 1,
+                                                         indices[-1] + 1, total))
@@ -0,0 +1,111 @@
+"""
+This module contains an index of the runs of character classes in the text of a
+document, on which the word and class motions are based.
+
+The text is divided in maximal runs of word characters, blanks (spaces and tabs)
+and other characters, where newlines don't belong to any run.
+The runs of word characters are exactly the matches of r'\b\w+\b', and all runs
+together are exactly the matches of r'\w+|[ \t]+|[^\w \t\n]+'.
+
+Operations are applied to the index by tokenizing only the content they insert,
+which may merge with the runs around it.
+"""
+import re
+from bisect import bisect_left, bisect_right
+
+from ..selection import Interval
+from ..textindex import TextIndex
+
+WORD, BLANK, OTHER = range(3)
+RUN_REGEX = re.compile(r'(\w+)|([ \t]+)|([^\w \t\n]+)')
+
+
+class BoundaryIndex(TextIndex):
+
+    """Index of the runs of character classes in the text of a document."""
+
+    def __init__(self, doc):
+        TextIndex.__init__(self, doc)
+        self.starts = []
+        self.ends = []
+        self.kinds = []
+
+    def build(self, text):
+        self.starts = []
+        self.ends = []
+        self.kinds = []
+        for match in RUN_REGEX.finditer(text):
+            self.starts.append(match.start())
+            self.ends.append(match.end())
+            self.kinds.append(match.lastindex - 1)
+
+    def update(self, operation):
+        starts, ends, kinds = self.starts, self.ends, self.kinds
+        new_starts, new_ends, new_kinds = [], [], []
+
+        def add(start, end, kind):
+            """Add a run, merging it with the previous run if they touch."""
+            if new_ends and new_ends[-1] == start and new_kinds[-1] == kind:
+                new_ends[-1] = end
+            else:
+                new_starts.append(start)
+                new_ends.append(end)
+                new_kinds.append(kind)
+
+        lo = 0
+
+        def copy(beg, end, offset):
+            """Copy the runs in the unmodified interval from beg to end."""
+            nonlocal lo
+            if beg >= end:
+                return
+            i = bisect_right(ends, beg, lo)
+            j = bisect_left(starts, end, i)
+            if i < j:
+                # Runs that are cut off by a modified interval may merge with it
+                add(max(starts[i], beg) + offset, min(ends[i], end) + offset, kinds[i])
+                if i + 1 < j:
+                    new_starts.extend(start + offset for start in starts[i + 1:j - 1])
+                    new_ends.extend(end + offset for end in ends[i + 1:j - 1])
+                    new_kinds.extend(kinds[i + 1:j - 1])
+                    add(starts[j - 1] + offset, min(ends[j - 1], end) + offset,
+                        kinds[j - 1])
+            lo = max(i, j - 1)
+
+        last = 0
+        offset = 0
+        for (beg, end), content in zip(operation.oldselection, operation.newcontent):
+            copy(last, beg, offset)
+            for match in RUN_REGEX.finditer(str(content)):
+                add(beg + offset + match.start(), beg + offset + match.end(),
+                    match.lastindex - 1)
+            offset += len(content) - (end - beg)
+            last = end
+        copy(last, ends[-1] if ends else 0, offset)
+
+        self.starts, self.ends, self.kinds = new_starts, new_ends, new_kinds
+
+    def find(self, pos, reverse=False, kind=None):
+        """
+        Generate the runs of given kind, or of any kind if kind is None, as intervals.
+        Forward, start with the first run ending at or after pos.
+        Backward, start with the last run starting at or before pos.
+        """
+        self.refresh()
+        starts, ends, kinds = self.starts, self.ends, self.kinds
+        if not reverse:
+            indices = range(bisect_left(ends, pos), len(starts))
+        else:
+            indices = range(bisect_right(starts, pos) - 1, -1, -1)
+        for i in indices:
+            if kind == None or kinds[i] == kind:
+                yield Interval(starts[i], ends[i])
+
+
+def boundaryindex(doc):
+    """Return the boundary index of doc, creating it if it doesn't exist yet."""
+    try:
+        return doc.boundaryindex
+    except AttributeError:
+        doc.boundaryindex = BoundaryIndex(doc)
+        return doc.boundaryindex
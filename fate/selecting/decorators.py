@@ -1,6 +1,7 @@
 from functools import wraps
 from ..selection import Selection, Interval
 from . import SelectModes
+from .selectorcache import selectorcache
 
 def partial(func, *args, docs='', **keywords):
     """Pragmatic solution for being able to set a metadata for a partial function"""
@@ -13,18 +14,32 @@ def partial(func, *args, docs='', **keywords):
     wrapper.args = args
     wrapper.keywords = keywords
     wrapper.docs = docs
+
+    # The batched and counted versions of func need the same arguments
+    for name in ('batch', 'counted'):
+        if getattr(func, name, None) != None:
+            setattr(wrapper, name, partial(getattr(func, name), *args, **keywords))
     return wrapper
 
 
 def selector(function):
-    """Turn given selector in a command that takes a document."""
+    """
+    Turn given selector in a command that takes a document.
+    Results are cached until the text changes, so selectors must not depend on
+    anything else than the text, the selection and their arguments.
+    """
     @wraps(function)
     def wrapper(doc, *args, selection=None, selectmode=None, preview=False, **kwargs):
         selection = selection or doc.selection
         selectmode = selectmode or doc.selectmode
 
-        result = function(
-            doc, *args, selection=selection, selectmode=selectmode, **kwargs)
+        key = (doc.revision, function, args, tuple(sorted(kwargs.items())),
+               tuple(selection), selectmode)
+        result = selectorcache(doc).lookup(key, lambda: function(
+            doc, *args, selection=selection, selectmode=selectmode, **kwargs))
+        if isinstance(result, Selection):
+            # The cached selection must not be modified
+            result = Selection(result)
 
         if preview:
             return result
@@ -34,10 +49,23 @@ def selector(function):
 
 
 def intervalselector(function):
-    """Turn given intervalselector in a command that takes a document."""
+    """
+    Turn given intervalselector in a command that takes a document.
+    If the intervalselector has a batch attribute, this is used to process all
+    intervals at once. It takes the document and the sorted list of intervals,
+    and returns a list with the new interval, or None, for each interval.
+    """
     @wraps(function)
     @selector
-    def wrapper(doc, selection, *args, selectmode=None, **kwargs):
+    def wrapper(doc, *args, selection=None, selectmode=None, **kwargs):
+        batch = getattr(function, 'batch', None)
+        if batch != None:
+            new_intervals = batch(doc, list(selection), *args, selectmode=selectmode,
+                                  **kwargs)
+            if any(new_interval == None for new_interval in new_intervals):
+                return
+            return Selection(new_intervals)
+
         new_intervals = []
         for interval in selection:
             new_interval = function(doc, interval, *args, selectmode=selectmode, **kwargs)
@@ -48,43 +76,67 @@ def intervalselector(function):
     return wrapper
 
 
+def proxy_interval(interval, selectmode):
+    """Return the interval that is passed to a selector according to selectmode."""
+    beg, end = interval
+    if selectmode == SelectModes.head:
+        return Interval(end, end)
+    elif selectmode == SelectModes.tail:
+        return Interval(beg, beg)
+    else:
+        return interval
+
+
+def process_interval(interval, new_interval, selectmode):
+    """Return the result of a selector for interval according to selectmode."""
+    if new_interval == None:
+        return
+
+    # Process interval differently based on selectmode
+    beg, end = interval
+    nbeg, nend = new_interval
+    if selectmode == SelectModes.head:
+        # beg is fixed, but end is determined by new interval
+        if nend <= end:
+            return Interval(beg, max(beg, nbeg))
+        else:
+            return Interval(beg, max(beg, nend))
+    elif selectmode == SelectModes.tail:
+        # end is fixed, but beg is determined by new interval
+        if nbeg >= beg:
+            return Interval(min(end, nend), end)
+        else:
+            return Interval(min(end, nbeg), end)
+    else:
+        return new_interval
+
+
 def intervalselector_withmode(function):
     """
     Turn given intervalselector in a command that takes a document and process
     according to selectmode.
     """
-    @wraps(function)
-    @intervalselector
     def wrapper(doc, interval, *args, selectmode=None, **kwargs):
         # Give different interval based on selectmode
-        beg, end = interval
-        if selectmode == SelectModes.head:
-            proxy_interval = Interval(end, end)
-        elif selectmode == SelectModes.tail:
-            proxy_interval = Interval(beg, beg)
-        else:
-            proxy_interval = interval
-
-        new_interval = function(doc, proxy_interval, *args, **kwargs)
-        if new_interval == None:
-            return
-
-        # Process interval differently based on selectmode
-        nbeg, nend = new_interval
-        if selectmode == SelectModes.head:
-            # beg is fixed, but end is determined by new interval
-            if nend <= end:
-                return Interval(beg, max(beg, nbeg))
-            else:
-                return Interval(beg, max(beg, nend))
-        elif selectmode == SelectModes.tail:
-            # end is fixed, but beg is determined by new interval
-            if nbeg >= beg:
-                return Interval(min(end, nend), end)
-            else:
-                return Interval(min(end, nbeg), end)
-        else:
-            return new_interval
-    return wrapper
+        new_interval = function(doc, proxy_interval(interval, selectmode), *args, **kwargs)
+        return process_interval(interval, new_interval, selectmode)
+
+    if getattr(function, 'batch', None) != None:
+        def batch(doc, intervals, *args, selectmode=None, **kwargs):
+            new_intervals = function.batch(
+                doc, [proxy_interval(interval, selectmode) for interval in intervals],
+                *args, **kwargs)
+            return [process_interval(interval, new_interval, selectmode)
+                    for interval, new_interval in zip(intervals, new_intervals)]
+        wrapper.batch = batch
 
+    command = wraps(function)(intervalselector(wrapper))
 
+    # Selectors that are applied count times at once, e.g. after a count prefix
+    if getattr(function, 'counted', None) != None:
+        def counted(doc, interval, count, *args, selectmode=None, **kwargs):
+            new_interval = function.counted(doc, proxy_interval(interval, selectmode),
+                                            count, *args, **kwargs)
+            return process_interval(interval, new_interval, selectmode)
+        command.counted = intervalselector(counted)
+    return command
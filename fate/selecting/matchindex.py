@@ -0,0 +1,159 @@
+"""
+This module contains an index of the matches of a pattern in the text of a document,
+on which searching forwards and backwards is based.
+
+The matches are kept as sorted lists of starts and ends, so the matches around a
+selection are found by bisection, and their number and rank are known.
+Operations only mark the region of the text they modify. When the index is used again,
+only the lines around this region are scanned again, if the pattern is known to look
+no further than the line it is matched at. Otherwise the whole text is scanned again.
+"""
+import re
+from bisect import bisect_left, bisect_right
+
+from ..selection import Selection, Interval
+from ..textindex import TextIndex
+from .. import patterns
+
+# Patterns built from these pieces never match or look past a newline,
+# except for the newline that ends the line they are matched at
+LOCAL_PATTERN_REGEX = re.compile(r'''(?x)(?:
+    \\[wdSbBAZ]                         # escapes that don't match newlines
+  | \\[^0-9A-Za-z\n]                    # escaped characters
+  | \((?!\?) | \(\?[aiLmu]*[:)] | \(\?P[<=]   # groups and harmless flags
+  | \[(?!\^)                            # character classes that aren't negated
+  | [^\\(\[$\x00-\x1f]                  # other characters and operators
+)*''')
+
+
+def line_local(pattern):
+    """
+    Return whether matching pattern at some position only looks at the line of
+    that position. This is judged conservatively from the source of the pattern.
+    """
+    return LOCAL_PATTERN_REGEX.fullmatch(pattern) != None
+
+
+class MatchIndex(TextIndex):
+
+    """Index of the matches of a pattern in the text of a document."""
+
+    def __init__(self, doc):
+        TextIndex.__init__(self, doc)
+        self.pattern = None
+        self.local = False
+        self.starts = []
+        self.ends = []
+        # The region modified since the last scan, as its start, its end in the
+        # scanned text and its end in the current text, or None
+        self.modified = None
+
+    def build(self, text):
+        self.modified = None
+        self.starts = []
+        self.ends = []
+        if self.pattern != None:
+            for match in patterns.compile(self.pattern).finditer(text):
+                self.starts.append(match.start())
+                self.ends.append(match.end())
+
+    def update(self, operation):
+        beg = operation.oldselection[0][0]
+        end = operation.oldselection[-1][1]
+        delta = sum(len(str(content)) for content in operation.newcontent)
+        delta -= sum(iend - ibeg for ibeg, iend in operation.oldselection)
+        if self.modified == None:
+            self.modified = (beg, end, end + delta)
+        else:
+            mbeg, old_end, new_end = self.modified
+            end = max(end, new_end)
+            self.modified = (min(mbeg, beg), old_end + end - new_end, end + delta)
+
+    def refresh(self):
+        TextIndex.refresh(self)
+        if self.modified != None:
+            self.rescan()
+
+    def rescan(self):
+        """Scan the lines of the modified region again."""
+        beg, old_end, new_end = self.modified
+        text = self.text
+        if not self.local:
+            self.build(text)
+            return
+        self.modified = None
+
+        # Matches before the line of beg, and after the first newline after the
+        # modified region, haven't looked at the modified region
+        restart = text.rfind('\n', 0, beg) + 1
+        resync = text.find('\n', new_end) + 1 or len(text) + 1
+        offset = new_end - old_end
+        i = bisect_left(self.starts, restart)
+        j = bisect_left(self.starts, resync - offset, i)
+
+        starts, ends = self.starts[:i], self.ends[:i]
+        for match in patterns.compile(self.pattern).finditer(text, restart, resync):
+            if match.start() < resync:
+                starts.append(match.start())
+                ends.append(match.end())
+        starts.extend(start + offset for start in self.starts[j:])
+        ends.extend(end + offset for end in self.ends[j:])
+        self.starts, self.ends = starts, ends
+
+    def find(self, pattern):
+        """Return the starts and ends of the matches of pattern."""
+        if pattern != self.pattern:
+            self.pattern = pattern
+            self.local = line_local(pattern)
+            self.text = None
+        self.refresh()
+        return self.starts, self.ends
+
+    def select(self, pattern, selection, reverse=False):
+        """
+        Return the indices of the matches of pattern that are selected by searching
+        from selection. These are the matches intersecting with selection,
+        or otherwise the first match after (or before) it.
+        """
+        starts, ends = self.find(pattern)
+
+        indices = []
+        for beg, end in selection:
+            lo = bisect_left(ends, beg, indices[-1] + 1 if indices else 0)
+            hi = bisect_right(starts, end, lo)
+            indices.extend(i for i in range(lo, hi)
+                           if intersects(beg, end, starts[i], ends[i]))
+        if indices and Selection(self.intervals(indices)) != selection:
+            return indices
+
+        if reverse:
+            i = bisect_left(starts, selection[-1][1]) - 1
+            step = -1
+        else:
+            i = bisect_right(ends, selection[0][0])
+            step = 1
+        while 0 <= i < len(starts):
+            if Selection(Interval(starts[i], ends[i])) != selection:
+                return [i]
+            i += step
+        return []
+
+    def intervals(self, indices):
+        return [Interval(self.starts[i], self.ends[i]) for i in indices]
+
+
+def intersects(beg, end, mbeg, mend):
+    """
+    Check if the match from mbeg to mend intersects with the interval from beg to end,
+    in the same way as Selection.intersects.
+    """
+    return mbeg <= beg < mend or mbeg < end <= mend or beg < mbeg and mend < end
+
+
+def matchindex(doc):
+    """Return the match index of doc, creating it if it doesn't exist yet."""
+    try:
+        return doc.matchindex
+    except AttributeError:
+        doc.matchindex = MatchIndex(doc)
+        return doc.matchindex
@@ -4,6 +4,7 @@ from .. import commands
 from . import SelectModes, normalselectmode
 from .decorators import selector, intervalselector, intervalselector_withmode
 from .selectpattern import selectfullline, selectnextfullline, selectpreviousfullline
+from ..textarray import textarray
 
 def escape(doc):
     if doc.selectmode != SelectModes.normal:
@@ -61,15 +62,46 @@ def emptyafter(doc, interval, selectmode=None):
 commands.emptyafter = intervalselector(emptyafter)
 
 
-def movedown(doc, interval, reverse=False):
-    """Move each interval one line down. Preserve fully selected lines."""
+def nth_fullline(doc, line, count, reverse=False):
+    """
+    Return the full line that selectnextfullline or selectpreviousfullline reach
+    from given full line in count steps, or the last one if there are less lines.
+    The full lines are looked up in the line index.
+    """
+    lines = textarray(doc)
+    eof = len(doc.text)
+    # The full lines are the lines including their eol character, followed by
+    # an empty line at the eof position if the text ends with an eol or not
+    nr_eols = lines.count_newlines()
+    nr_lines = nr_eols + 1 if lines.line_start(nr_eols) == eof else nr_eols + 2
+
+    def fullline(i):
+        if i >= nr_eols:
+            return Interval(lines.line_start(nr_eols) if i == nr_eols else eof, eof)
+        return Interval(lines.line_start(i), lines.line_start(i + 1))
+
+    i = lines.line_of(line[0])
+    if fullline(i) != line:
+        i += 1
+    if not reverse:
+        target = min(i + count, nr_lines - 1)
+    else:
+        target = max(i - count, 0)
+    if target != i:
+        return fullline(target)
+
+
+def movedown(doc, interval, reverse=False, count=1):
+    """Move each interval count lines down. Preserve fully selected lines."""
     beg, end = interval
     if end - beg > 0:
         currentline = selectfullline(doc, Interval(end - 1, end))
     else:
         currentline = selectfullline(doc, Interval(end, end))
 
-    if not reverse:
+    if count != 1:
+        nextline = nth_fullline(doc, currentline, count, reverse)
+    elif not reverse:
         nextline = selectnextfullline(doc, currentline)
     else:
         nextline = selectpreviousfullline(doc, currentline)
@@ -96,12 +128,14 @@ def movedown(doc, interval, reverse=False):
         nbeg = min(nbeg, nextline[1] - 1)
 
     return Interval(nbeg, nend)
+movedown.counted = lambda doc, interval, count: movedown(doc, interval, count=count)
 commands.movedown = intervalselector_withmode(movedown)
 
 
-def moveup(doc, interval):
-    """Move each interval one line up. Preserve fully selected lines."""
-    return movedown(doc, interval, reverse=True)
+def moveup(doc, interval, count=1):
+    """Move each interval count lines up. Preserve fully selected lines."""
+    return movedown(doc, interval, reverse=True, count=count)
+moveup.counted = lambda doc, interval, count: moveup(doc, interval, count=count)
 commands.moveup = intervalselector_withmode(moveup)
 
 
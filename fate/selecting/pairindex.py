@@ -0,0 +1,295 @@
+"""
+This module contains an index of the delimiter pairs in the text of a document.
+
+The positions of the brackets are kept up to date with the operations on the
+document, so the text doesn't have to be scanned again after an edit.
+Brackets are paired by nesting, each kind of bracket on its own, and unmatched
+brackets are ignored. The nesting depths of the brackets are summarised per block
+of positions, so the brackets enclosing a position are found in logarithmic time,
+however far away they are.
+Quotes and other characters don't nest, so they are paired with the next
+occurrence of the same character, by scanning the text around the interval.
+"""
+import re
+from itertools import accumulate
+from operator import add
+
+from ..textindex import TextIndex, PositionList
+
+CHARACTER_PAIRS = [('{', '}'), ('[', ']'), ('(', ')'), ('<', '>'), ('\'', '\''),
+                   ('"', '"')]
+BRACKET_PAIRS = [(fst, snd) for fst, snd in CHARACTER_PAIRS if fst != snd]
+
+
+class BracketPositions(PositionList):
+
+    """
+    Positions of one kind of bracket, together with the nesting depth before each
+    of them, relative to the start of its block.
+    The lowest depth in each block is kept in a tree over the blocks, so the
+    block in which the depth first reaches some level is found by descending the
+    tree, instead of walking over all positions in between.
+    An edit only invalidates the depths of the blocks it rebuilds.
+    """
+
+    def __init__(self, positions, opening):
+        self.opening = opening
+        # For each block, the depth before each of its positions and after the last
+        # one, the depth at its end, and the lowest depths before and after them
+        self.depths = []
+        self.totals = []
+        self.lows_before = []
+        self.lows_after = []
+        # The depth at the start of each block, and the trees of the lowest
+        # absolute depths before and after the positions of the blocks
+        self.starts = None
+        self.tree_before = None
+        self.tree_after = None
+        PositionList.__init__(self, positions)
+
+    def replace_blocks(self, lo, hi, positions):
+        count = len(self.blocks)
+        PositionList.replace_blocks(self, lo, hi, positions)
+        added = [None] * (len(self.blocks) - count + hi - lo)
+        self.depths[lo:hi] = added
+        self.totals[lo:hi] = added
+        self.lows_before[lo:hi] = added
+        self.lows_after[lo:hi] = added
+        self.starts = None
+
+    def summarise(self, text):
+        """Bring the depths up to date with text, which contains the positions."""
+        if self.starts != None:
+            return
+        b = 0
+        while True:
+            try:
+                b = self.depths.index(None, b)
+            except ValueError:
+                break
+            offset = self.offsets[b]
+            depth = 0
+            depths = [0]
+            for position in self.blocks[b]:
+                depth += 1 if text[position + offset] == self.opening else -1
+                depths.append(depth)
+            self.depths[b] = depths
+            self.totals[b] = depth
+            self.lows_before[b] = min(depths[:-1])
+            self.lows_after[b] = min(depths[1:])
+            b += 1
+
+        self.starts = [0]
+        self.starts.extend(accumulate(self.totals))
+        self.tree_before = _tree(list(map(add, self.starts, self.lows_before)))
+        self.tree_after = _tree(list(map(add, self.starts, self.lows_after)))
+
+    def depth(self, b, i):
+        """Return the depth before the i-th position of block b."""
+        if b == len(self.blocks):
+            return self.starts[b]
+        return self.starts[b] + self.depths[b][i]
+
+    def position(self, b, i):
+        return self.blocks[b][i] + self.offsets[b]
+
+    def before_level(self, b, i, level):
+        """
+        Generate the block and index of the last position before the i-th
+        position of block b with the depth before it at level, and so on for
+        each level below it, i.e. the opening brackets that enclose it.
+        """
+        while b >= 0:
+            if b < len(self.blocks):
+                start = self.starts[b]
+                depths = self.depths[b]
+                for j in range(i - 1, -1, -1):
+                    if start + depths[j] == level:
+                        yield b, j
+                        level -= 1
+            b = _last_at_most(self.tree_before, min(b, len(self.blocks)), level)
+            if b >= 0:
+                i = len(self.blocks[b])
+
+    def after_level(self, b, i, level):
+        """
+        Generate the block and index of the first position at or after the i-th
+        position of block b with the depth after it at level, and so on for each
+        level below it, i.e. the closing brackets that enclose it.
+        """
+        while b < len(self.blocks):
+            start = self.starts[b]
+            depths = self.depths[b]
+            for j in range(i, len(self.blocks[b])):
+                if start + depths[j + 1] == level:
+                    yield b, j
+                    level -= 1
+            b = _first_at_most(self.tree_after, b + 1, level)
+            i = 0
+
+
+def _tree(leaves):
+    """
+    Return the levels of a tree over leaves, from the leaves up to the root,
+    in which each node is the minimum of its children.
+    """
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        if len(level) % 2:
+            level.append(float('inf'))
+        levels.append(list(map(min, level[::2], level[1::2])))
+    return levels
+
+
+def _last_at_most(levels, hi, value):
+    """Return the index of the last leaf before hi that is at most value, or -1."""
+    h = 0
+    i = hi - 1
+    while i >= 0:
+        if levels[h][i] <= value:
+            while h > 0:
+                h -= 1
+                i = 2 * i + 1
+                if levels[h][i] > value:
+                    i -= 1
+            return i
+        # Continue with the subtree before the leaves that have been checked
+        if i % 2:
+            i -= 1
+        else:
+            h += 1
+            i = i // 2 - 1
+    return -1
+
+
+def _first_at_most(levels, lo, value):
+    """
+    Return the index of the first leaf at or after lo that is at most value,
+    or the number of leaves if there is none.
+    """
+    h = 0
+    i = lo
+    while i < len(levels[h]):
+        if levels[h][i] <= value:
+            while h > 0:
+                h -= 1
+                i = 2 * i
+                if levels[h][i] > value:
+                    i += 1
+            return i
+        # Continue with the subtree after the leaves that have been checked
+        if i % 2:
+            h += 1
+            i = i // 2 + 1
+        else:
+            i += 1
+    return len(levels[0])
+
+
+class BracketPairs:
+
+    """
+    The pairs of one kind of bracket, found from the depths of the brackets.
+    The brackets enclosing a position are the last brackets before it and the
+    first brackets after it at each lower depth.
+    """
+
+    def __init__(self, text, positions, opening, closing):
+        self.text = text
+        self.positions = positions
+        self.opening = opening
+        self.closing = closing
+        positions.summarise(text)
+
+    def next_pair(self, pos):
+        """Return the first pair opening at or after pos, as interval including both."""
+        positions = self.positions
+        b, i = positions.locate(pos)
+        while b < len(positions.blocks):
+            if self.text[positions.position(b, i)] == self.opening:
+                level = positions.depth(b, i)
+                for c, j in positions.after_level(b, i + 1, level):
+                    return positions.position(b, i), positions.position(c, j) + 1
+            # Brackets that are never closed are skipped
+            i += 1
+            if i == len(positions.blocks[b]):
+                b += 1
+                i = 0
+
+    def enclosing_pair(self, beg, end):
+        """
+        Return the smallest pair opening before beg and closing at or after end,
+        as interval including both delimiters.
+        """
+        positions = self.positions
+        b, i = positions.locate(beg)
+        level = positions.depth(b, i) - 1
+        for (c, j), (d, k) in zip(positions.before_level(b, i, level),
+                                  positions.after_level(b, i, level)):
+            closed = positions.position(d, k)
+            if closed >= end:
+                return positions.position(c, j), closed + 1
+
+
+class CharacterPairs:
+
+    """The pairs of a character that doesn't nest, found by scanning the text."""
+
+    def __init__(self, text, char):
+        self.text = text
+        self.char = char
+
+    def pair_from(self, opened):
+        if opened != -1:
+            closed = self.text.find(self.char, opened + 1)
+            if closed != -1:
+                return opened, closed + 1
+
+    def next_pair(self, pos):
+        """Pair the first occurrence at or after pos with the next one."""
+        return self.pair_from(self.text.find(self.char, pos))
+
+    def enclosing_pair(self, beg, end):
+        """Pair the last occurrence before beg with the next one."""
+        return self.pair_from(self.text.rfind(self.char, 0, beg))
+
+
+class PairIndex(TextIndex):
+
+    """Index of the bracket positions in the text of a document."""
+
+    def __init__(self, doc):
+        TextIndex.__init__(self, doc)
+        # The positions of the brackets of each kind, by opening bracket
+        self.positions = {}
+        self.regexes = {opening: re.compile(re.escape(opening) + '|' + re.escape(closing))
+                        for opening, closing in BRACKET_PAIRS}
+
+    def finder(self, opening):
+        regex = self.regexes[opening]
+        return lambda text: [match.start() for match in regex.finditer(text)]
+
+    def build(self, text):
+        self.positions = {opening: BracketPositions(self.finder(opening)(text), opening)
+                          for opening in self.regexes}
+
+    def update(self, operation):
+        for opening, positions in self.positions.items():
+            positions.update(operation, self.finder(opening))
+
+    def get_pairs(self, opening, closing):
+        """Return the pairs of given delimiters."""
+        if opening == closing or opening not in self.regexes:
+            return CharacterPairs(self.doc.text, opening)
+        self.refresh()
+        return BracketPairs(self.text, self.positions[opening], opening, closing)
+
+
+def pairindex(doc):
+    """Return the pair index of doc, creating it if it doesn't exist yet."""
+    try:
+        return doc.pairindex
+    except AttributeError:
+        doc.pairindex = PairIndex(doc)
+        return doc.pairindex
@@ -10,31 +10,32 @@ selections.
 
 from ..selection import Interval
 from .decorators import intervalselector_withmode
+from .pairindex import CHARACTER_PAIRS, pairindex
 from . import commands
 
 
 def select_delimiting_char(doc, interval, char=None, backward=False):
     """
     Select around given character.
+    Forward, the pair starting at or after the interval is selected.
+    Backward, the smallest pair enclosing the interval is selected.
     Return None if not all intervals are surrounded.
     """
     beg, end = interval
 
     # Check if we should check for a matching pair
-    character_pairs = [('{', '}'), ('[', ']'), ('(', ')'), ('<', '>')]
     beg_delim, end_delim = char, char
-    for fst, snd in character_pairs:
+    for fst, snd in CHARACTER_PAIRS:
         if char == fst or char == snd:
             beg_delim, end_delim = fst, snd
             break
 
-    # For each interval find the smallest surrounding pair
+    pairs = pairindex(doc).get_pairs(beg_delim, end_delim)
     if not backward:
-        try:
-            match_beg = doc.text.index(beg_delim, beg)
-            match_end = doc.text.index(end_delim, match_beg + 1) + 1
-        except ValueError:
+        pair = pairs.next_pair(beg)
+        if pair == None:
             return
+        match_beg, match_end = pair
 
         if beg == match_beg and end == match_end:
             # Exclude delimiters
@@ -43,11 +44,10 @@ def select_delimiting_char(doc, interval, char=None, backward=False):
             # Include delimiters
             return Interval(match_beg, match_end)
     else:
-        try:
-            match_beg = doc.text.rindex(beg_delim, 0, beg)
-            match_end = doc.text.index(end_delim, match_beg + 1) + 1
-        except ValueError:
+        pair = pairs.enclosing_pair(beg, end)
+        if pair == None:
             return
+        match_beg, match_end = pair
 
         if beg == match_beg + 1 and end == match_end - 1:
             # Include delimiters
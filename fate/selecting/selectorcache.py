@@ -0,0 +1,55 @@
+"""
+This module contains a cache for the results of selectors.
+
+Selectors are often evaluated several times on the same text and selection,
+e.g. for a preview, or as part of composed commands.
+Since a selector only depends on the text, the selection and its arguments,
+its result can be reused as long as the text doesn't change.
+Results are therefore keyed by the revision of the document, which increases
+whenever the text changes, together with the selector, its arguments and the
+selection.
+The least recently used results are evicted when the cache is full.
+"""
+from collections import OrderedDict
+
+
+class SelectorCache:
+
+    """Cache with least recently used eviction, which counts hits and misses."""
+    maxsize = 256
+
+    def __init__(self):
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key, compute):
+        """Return the result for key, calling compute() if it is not cached."""
+        try:
+            result = self.results[key]
+        except KeyError:
+            self.misses += 1
+            result = self.results[key] = compute()
+            if len(self.results) > self.maxsize:
+                self.results.popitem(last=False)
+                self.evictions += 1
+            return result
+        except TypeError:
+            # Some argument is not hashable
+            return compute()
+        self.hits += 1
+        self.results.move_to_end(key)
+        return result
+
+    def clear(self):
+        self.results.clear()
+
+
+def selectorcache(doc):
+    """Return the selector cache of doc, creating it if it doesn't exist yet."""
+    try:
+        return doc.selectorcache
+    except AttributeError:
+        doc.selectorcache = SelectorCache()
+        return doc.selectorcache
@@ -1,11 +1,15 @@
 import re
+from itertools import islice
 from ..selection import Selection, Interval
+from ..graphemes import clusters
 from .decorators import intervalselector_withmode, partial
-from .. import commands
+from .boundaryindex import WORD, boundaryindex
+from .selectorcache import selectorcache
+from .. import commands, patterns
 
 def findpattern(text, pattern, reverse=False, group=0):
     """Find intervals that match given pattern."""
-    matches = re.finditer(pattern, text)
+    matches = patterns.compile(pattern).finditer(text)
     if reverse:
         matches = reversed(list(matches))
     return [Interval(match.start(group), match.end(group))
@@ -47,11 +51,127 @@ def selectpattern(pattern, doc, selection, reverse=False, group=0):
     return newselection
 
 
-def select_local_pattern(pattern, doc, interval, reverse=False,
-                         group=0, only_within=False, allow_same_interval=False):
+def sync_anywhere(text, pos):
+    return pos
 
-    match_intervals = findpattern(doc.text, pattern, reverse, group)
 
+def sync_line(text, pos):
+    return text.rfind('\n', 0, pos) + 1
+
+
+def sync_paragraph(text, pos):
+    # No paragraph spans the second newline of an empty line
+    return text.rfind('\n\n', 0, pos) + 1
+
+
+def sync_run(charclass):
+    """Return a sync function for a pattern matching maximal runs of characters."""
+    def classify(char):
+        for i, regex in enumerate(charclass):
+            if regex.match(char):
+                return i
+
+    def sync(text, pos):
+        if pos >= len(text):
+            return pos
+        current = classify(text[pos])
+        while pos > 0 and current != None and classify(text[pos - 1]) == current:
+            pos -= 1
+        return pos
+    return sync
+
+sync_word = sync_run([re.compile(r'\w')])
+sync_class = sync_run([re.compile(r'\w'), re.compile(r'[ \t]'),
+                       re.compile(r'[^\w \t\n]')])
+
+# For the patterns of the motions below we know positions in the text from which
+# scanning gives the same matches as scanning the whole text.
+# A sync function maps a position to such a position at or before it.
+SYNC_FUNCTIONS = {
+    r'(?s).': sync_anywhere,
+    r'\s': sync_anywhere,
+    r'\b\w+\b': sync_word,
+    r'\w+|[ \t]+|[^\w \t\n]+': sync_class,
+    r'(?m)^([ \t]*)': sync_line,
+    r'(?m)^[ \t]*([^\n]*)': sync_line,
+    r'[^\n]*\n?': sync_line,
+    r'(?s)((?:[^\n][\n]?)+)': sync_paragraph,
+}
+
+patterns.precompile(SYNC_FUNCTIONS)
+
+# The matches of these patterns are runs in the boundary index of the document,
+# either of a single kind or of any kind
+INDEXED_PATTERNS = {
+    r'\b\w+\b': WORD,
+    r'\w+|[ \t]+|[^\w \t\n]+': None,
+}
+
+# Matches any character, but is matched by grapheme clusters instead
+CHARACTER_PATTERN = r'(?s).'
+
+# Size of the first window that is scanned backwards, which doubles each time
+WINDOW_SIZE = 256
+
+
+def sync_function(pattern):
+    """Return the sync function of pattern, or None if it is not known."""
+    try:
+        return SYNC_FUNCTIONS[pattern]
+    except KeyError:
+        pass
+    # Single characters, e.g. from local_find
+    if len(pattern) <= 2 and re.escape(pattern[-1:]) == pattern:
+        return sync_anywhere
+
+
+def findpattern_around(text, pattern, pos, reverse=False, group=0):
+    """
+    Generate the intervals matching pattern that start at or after the sync position
+    before pos, or in reverse order those whose match starts at or before pos.
+    These are the same intervals as findpattern gives around pos, but only
+    as much of the text is scanned as is needed to find the ones that are consumed.
+    """
+    sync = sync_function(pattern)
+    if sync == None:
+        yield from findpattern(text, pattern, reverse, group)
+        return
+
+    regex = patterns.compile(pattern)
+    if not reverse:
+        for match in regex.finditer(text, sync(text, pos)):
+            yield Interval(match.start(group), match.end(group))
+        return
+
+    # Scan windows of growing size, from the window containing pos backwards.
+    # Window boundaries are sync positions, so no match crosses them.
+    stop = None
+    size = WINDOW_SIZE
+    while stop != 0:
+        start = sync(text, max(0, pos - size) if stop == None else max(0, stop - size))
+        intervals = []
+        for match in regex.finditer(text, start):
+            if (match.start() > pos if stop == None else match.start() >= stop):
+                break
+            intervals.append(Interval(match.start(group), match.end(group)))
+        yield from reversed(intervals)
+        stop = start
+        size *= 2
+
+
+def find_local_matches(doc, pattern, pos, reverse=False, group=0):
+    """Generate the matches around pos that a local pattern selector may select."""
+    if group == 0 and pattern in INDEXED_PATTERNS:
+        return boundaryindex(doc).find(pos, reverse, INDEXED_PATTERNS[pattern])
+    if group == 0 and pattern == CHARACTER_PATTERN:
+        # Characters as the user sees them
+        return (Interval(beg, end) for beg, end in clusters(doc.text, pos, reverse))
+    return findpattern_around(doc.text, pattern, pos, reverse, group)
+
+
+def first_suitable_match(match_intervals, interval, reverse=False,
+                         only_within=False, allow_same_interval=False):
+    """Return the first of the matches that a local pattern selector selects."""
     beg, end = interval
     new_interval = None
 
@@ -74,6 +194,132 @@ def select_local_pattern(pattern, doc, interval, reverse=False,
             return new_interval
 
 
+def select_local_pattern(pattern, doc, interval, reverse=False,
+                         group=0, only_within=False, allow_same_interval=False):
+    def compute():
+        beg, end = interval
+        # Matches on the other side of the interval are never selected
+        match_intervals = find_local_matches(doc, pattern, end if reverse else beg,
+                                             reverse, group)
+        return first_suitable_match(match_intervals, interval, reverse, only_within,
+                                    allow_same_interval)
+
+    # Other selectors, e.g. movedown, use this one for the same intervals repeatedly
+    key = (doc.revision, select_local_pattern, pattern, interval, reverse, group,
+           only_within, allow_same_interval)
+    return selectorcache(doc).lookup(key, compute)
+
+
+def select_local_patterns(pattern, doc, intervals, reverse=False,
+                          group=0, only_within=False, allow_same_interval=False):
+    """
+    Batched version of select_local_pattern, for a sorted list of intervals.
+    The intervals are handled in order of their direction, in a single sweep over
+    the matches, since the matches that are selected move along with the intervals.
+    This way, k intervals take a single pass over the text instead of k passes.
+    """
+    results = [None] * len(intervals)
+    order = range(len(intervals) - 1, -1, -1) if reverse else range(len(intervals))
+    # If the matches can be found locally, we jump ahead to the next interval when
+    # the matches in between are not needed
+    local = group == 0 and pattern in INDEXED_PATTERNS or sync_function(pattern) != None
+    match_intervals = None
+
+    # Matches that have been generated, of which those before head are behind us
+    matches = []
+    head = 0
+
+    for i in order:
+        # Matches on the other side of the interval are never selected, neither
+        # for the intervals that follow
+        head = skip_matches(matches, head, intervals[i], reverse)
+        if match_intervals == None or local and head == len(matches):
+            beg, end = intervals[i]
+            match_intervals = find_local_matches(doc, pattern, end if reverse else beg,
+                                                 reverse, group)
+            matches = []
+            head = 0
+        results[i] = first_suitable_match(buffered(matches, match_intervals, head),
+                                          intervals[i], reverse, only_within,
+                                          allow_same_interval)
+    return results
+
+select_local_pattern.batch = select_local_patterns
+
+
+def select_local_pattern_counted(pattern, doc, interval, count, reverse=False,
+                                 group=0, only_within=False, allow_same_interval=False):
+    """
+    Return the interval that count successive applications of select_local_pattern
+    select, or the last one that is found if there are less matches.
+    The matches are generated only once for all steps, and for words the runs in
+    the boundary index are counted directly.
+    """
+    if (group == 0 and INDEXED_PATTERNS.get(pattern, -1) == WORD and not only_within
+            and not allow_same_interval):
+        return select_nth_word(doc, interval, count, reverse)
+
+    beg, end = interval
+    match_intervals = find_local_matches(doc, pattern, end if reverse else beg,
+                                         reverse, group)
+    matches = []
+    head = 0
+    result = None
+    for _ in range(count):
+        head = skip_matches(matches, head, interval, reverse)
+        new_interval = first_suitable_match(buffered(matches, match_intervals, head),
+                                            interval, reverse, only_within,
+                                            allow_same_interval)
+        if new_interval == None:
+            break
+        result = interval = new_interval
+    return result
+
+select_local_pattern.counted = select_local_pattern_counted
+
+
+def select_nth_word(doc, interval, count, reverse=False):
+    """Return the word that selectnextword or selectpreviousword reach in count steps."""
+    beg, end = interval
+    if not reverse:
+        # The words ending after beg, other than the interval itself
+        words = (word for word in boundaryindex(doc).find(beg, False, WORD)
+                 if word[1] > beg and word != interval)
+    else:
+        # The words starting before end, other than the interval itself
+        words = (word for word in boundaryindex(doc).find(end, True, WORD)
+                 if word[0] < end and word != interval)
+    result = None
+    for result in islice(words, count):
+        pass
+    return result
+
+
+def buffered(matches, match_intervals, start):
+    """
+    Generate the matches from index start, taking them from match_intervals
+    and appending them to matches when they haven't been generated before.
+    """
+    i = start
+    while True:
+        if i == len(matches):
+            match = next(match_intervals, None)
+            if match == None:
+                return
+            matches.append(match)
+        yield matches[i]
+        i += 1
+
+
+def skip_matches(matches, head, interval, reverse=False):
+    """Return the index of the first match that may be selected for interval."""
+    beg, end = interval
+    while head < len(matches) and (matches[head][0] > end if reverse
+                                   else matches[head][1] < beg):
+        head += 1
+    return head
+
+
 selectindent = partial(select_local_pattern, r'(?m)^([ \t]*)', reverse=True, group=1,
                        allow_same_interval=True)
 commands.selectindent = intervalselector_withmode(selectindent)
@@ -97,7 +343,7 @@ def patternpair(pattern, **kwargs):
     return (partial(select_local_pattern, pattern, **kwargs),
             partial(select_local_pattern, pattern, reverse=True, **kwargs))
 
-selectnextchar, selectpreviouschar = patternpair(r'(?s).')
+selectnextchar, selectpreviouschar = patternpair(CHARACTER_PATTERN)
 commands.selectnextchar = intervalselector_withmode(selectnextchar)
 commands.selectpreviouschar = intervalselector_withmode(selectpreviouschar)
 selectnextword, selectpreviousword = patternpair(r'\b\w+\b')
@@ -1,5 +1,7 @@
 """This module contains the Interval and the Selection class."""
+from bisect import bisect_left, bisect_right
 from logging import debug
+from .textslice import TextSlice
 
 class Interval:
 
@@ -111,15 +113,37 @@ class Selection:
                 .format(self, len(doc.text))
             )
 
-    def content(self, doc):
-        """Return the content of self."""
-        return [doc.text[max(0, beg):min(len(doc.text), end)]
-                for beg, end in self]
+    def content(self, doc, lazy=False):
+        """
+        Return the content of self.
+        If lazy is True, the content is returned as TextSlices which refer to
+        the current text, so that no copies are made until the content is read.
+        """
+        text = doc.text
+        if lazy:
+            return [TextSlice(text, beg, end) for beg, end in self]
+        return [text[max(0, beg):min(len(text), end)] for beg, end in self]
 
     def index(self, interval):
         """Return the index of given interval."""
         return self._intervals.index(interval)
 
+    def overlapping(self, beg, end):
+        """
+        Return the slice of indices of the intervals that overlap or touch
+        the interval (beg, end).
+        Since the intervals are sorted and disjoint, this takes logarithmic time.
+        """
+        # Both the begin and end positions of the intervals are sorted,
+        # so we can bisect on either of them
+        first = bisect_left(self._intervals, Interval(beg, beg))
+        if first > 0 and self._intervals[first - 1][1] >= beg:
+            first -= 1
+        last = bisect_right(self._intervals, Interval(end, end), first)
+        if last < len(self._intervals) and self._intervals[last][0] <= end:
+            last += 1
+        return slice(first, last)
+
     def contains(self, pos):
         """Check if given position is contained in self."""
         for interval in self:
@@ -141,6 +165,24 @@ class Selection:
         nbeg, nend = obj
         assert nbeg <= nend
 
+        # Intervals are often added in sorted order, e.g. by selectors,
+        # so handle additions at the end of the selection in constant time
+        if self._intervals:
+            beg, end = self._intervals[-1]
+            # [  ]
+            #      ( )
+            if end < nbeg:
+                self._intervals.append(Interval(nbeg, nend))
+                return
+            # [  ]
+            #   (  )
+            if beg < nbeg:
+                self._intervals[-1] = Interval(beg, max(end, nend))
+                return
+        else:
+            self._intervals.append(Interval(nbeg, nend))
+            return
+
         # First merge overlapping or adjacent existing intervals into the new interval
         for beg, end in self._intervals:
             # [  ]  existing interval
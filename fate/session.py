@@ -0,0 +1,296 @@
+"""
+This module provides sessions, in which several clients edit the same text concurrently.
+
+A session is hosted by a SessionServer listening on a unix socket, which holds the
+authoritative text and the history of operations on it.
+Each document that joins the session gets a SessionClient, which sends the
+operations that are applied to the document to the server,
+and applies the operations of the other clients to the document.
+
+Clients don't wait for each other: concurrent operations are transformed by the
+server and the clients (see the transform module), such that all texts converge.
+The protocol consists of JSON messages, one per line:
+- the server sends {'type': 'init', 'text': ..., 'revision': ...} to a new client,
+- a client sends {'type': 'operation', 'revision': ..., 'components': ...}, where
+  revision is the number of operations of the server the operation is based on,
+- the server answers with {'type': 'ack', 'revision': ...} to the sender, and sends
+  {'type': 'operation', 'revision': ..., 'components': ...} to the other clients.
+Each client has at most one operation on its way to the server; the other local
+operations are buffered until it is acknowledged.
+
+Remote operations are applied when the view is refreshed, and only in normal mode,
+such that they don't interfere with a mode that is in progress.
+They are not added to the undotree, but the local history is transformed over them,
+such that undo only reverts the edits of the user of the document.
+"""
+import json
+import socket
+import socketserver
+from collections import deque
+from threading import Lock, Thread
+from time import monotonic, sleep
+from logging import debug, error, info
+
+from .document import Document
+from .transform import (apply, transform, transform_selection, to_components,
+                        from_components)
+
+
+def difference(old, new):
+    """Return components that turn old into new, by comparing prefix and suffix."""
+    prefix = 0
+    length = min(len(old), len(new))
+    while prefix < length and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < length - prefix
+           and old[len(old) - suffix - 1] == new[len(new) - suffix - 1]):
+        suffix += 1
+
+    components = []
+    for component in (prefix, new[prefix:len(new) - suffix],
+                      -(len(old) - prefix - suffix), suffix):
+        if component:
+            components.append(component)
+    return components
+
+
+class SessionHandler(socketserver.StreamRequestHandler):
+
+    """Connection of the server with a single client."""
+
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        self.write_lock = Lock()
+
+    def send(self, message):
+        with self.write_lock:
+            self.wfile.write((json.dumps(message) + '\n').encode())
+            self.wfile.flush()
+
+    def handle(self):
+        self.server.join(self)
+        try:
+            for line in self.rfile:
+                message = json.loads(line.decode())
+                if message['type'] == 'operation':
+                    self.server.receive(self, message['revision'],
+                                        message['components'])
+        except (OSError, ValueError, KeyError) as e:
+            error('Session client disconnected: ' + str(e))
+        finally:
+            self.server.leave(self)
+
+
+class SessionServer(socketserver.ThreadingUnixStreamServer):
+
+    """Server holding the shared text of a session."""
+    daemon_threads = True
+
+    def __init__(self, path, text=''):
+        socketserver.ThreadingUnixStreamServer.__init__(self, path, SessionHandler)
+        self.path = path
+        self.text = text
+        self.history = []
+        self.clients = []
+        self.lock = Lock()
+
+    @property
+    def revision(self):
+        return len(self.history)
+
+    def join(self, client):
+        with self.lock:
+            client.send({'type': 'init', 'text': self.text, 'revision': self.revision})
+            self.clients.append(client)
+
+    def leave(self, client):
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def receive(self, sender, revision, components):
+        """Transform an operation over the operations the sender hasn't seen yet."""
+        with self.lock:
+            for concurrent in self.history[revision:]:
+                components, _ = transform(components, concurrent)
+            self.text = apply(self.text, components)
+            self.history.append(components)
+
+            for client in self.clients:
+                if client is sender:
+                    client.send({'type': 'ack', 'revision': self.revision})
+                else:
+                    client.send({'type': 'operation', 'revision': self.revision,
+                                 'components': components})
+
+    def start(self):
+        """Serve in a background thread."""
+        thread = Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        info('Serving session on ' + self.path)
+
+
+class SessionClient:
+
+    """Connection of a document with a session."""
+
+    def __init__(self, doc, path):
+        self.doc = doc
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(path)
+        self.reader = self.socket.makefile('rb')
+
+        # Local operations that have not been acknowledged yet
+        # The first one has been sent to the server
+        self.pending = deque()
+        # Messages from the server, received by the reader thread
+        self.incoming = deque()
+        self.applying = False
+
+        message = json.loads(self.reader.readline().decode())
+        self.revision = message['revision']
+        self.shadow = doc.text
+        if message['text'] != doc.text:
+            self.apply_remote(difference(doc.text, message['text']))
+            self.shadow = doc.text
+
+        thread = Thread(target=self.read)
+        thread.daemon = True
+        thread.start()
+
+        doc.OnApplyOperation.add(self.local_operation)
+        doc.OnRefreshView.add(self.sync)
+
+    def read(self):
+        """Receive messages from the server, in a background thread."""
+        try:
+            for line in self.reader:
+                self.incoming.append(json.loads(line.decode()))
+        except (OSError, ValueError) as e:
+            error('Session connection failed: ' + str(e))
+        self.incoming.append({'type': 'closed'})
+
+    def send(self, components):
+        message = {'type': 'operation', 'revision': self.revision, 'components': components}
+        self.socket.sendall((json.dumps(message) + '\n').encode())
+
+    def push(self, components):
+        """Send components to the server, or buffer them if we are waiting."""
+        self.pending.append(components)
+        if len(self.pending) == 1:
+            self.send(components)
+
+    def local_operation(self, doc, operation, oldtext, newtext):
+        """Handler for OnApplyOperation."""
+        if not self.applying:
+            # The text may have been changed without an operation
+            if oldtext != self.shadow:
+                self.push(difference(self.shadow, oldtext))
+            self.push(to_components(operation, len(oldtext)))
+        self.shadow = newtext
+
+    def sync(self, doc=None):
+        """Process the messages from the server."""
+        if self.doc.text != self.shadow:
+            self.push(difference(self.shadow, self.doc.text))
+            self.shadow = self.doc.text
+
+        if self.doc.mode is not self.doc.modes.normalmode:
+            return
+
+        while self.incoming:
+            message = self.incoming.popleft()
+            debug('Session message: {}'.format(message))
+            if message['type'] == 'ack':
+                self.revision = message['revision']
+                self.pending.popleft()
+                if self.pending:
+                    self.send(self.pending[0])
+            elif message['type'] == 'operation':
+                self.revision = message['revision']
+                self.apply_remote(message['components'])
+            elif message['type'] == 'closed':
+                self.leave()
+                return
+
+    def apply_remote(self, components):
+        """Apply the components of another client to the document."""
+        # The pending local operations are not known by the other client,
+        # so the remote operation has to be transformed over them
+        pending = deque()
+        for local in self.pending:
+            local, components = transform(local, components)
+            pending.append(local)
+        self.pending = pending
+
+        doc = self.doc
+        operation = from_components(components, doc.text)
+        if operation == None:
+            return
+        operation.selection_before = doc.selection
+        operation.selection_after = transform_selection(doc.selection, components)
+        # The operation is not undoable by this user, but the local history
+        # has to follow it
+        doc.undotree.rebase(operation)
+        self.applying = True
+        try:
+            operation.do(doc)
+        finally:
+            self.applying = False
+
+    def wait(self, timeout=1):
+        """
+        Wait until the pending local operations have been acknowledged,
+        processing the messages from the server in the meantime.
+        Return whether this succeeded within timeout seconds.
+        """
+        deadline = monotonic() + timeout
+        while True:
+            self.sync()
+            if not self.pending:
+                return True
+            if monotonic() > deadline:
+                return False
+            sleep(0.001)
+
+    def leave(self):
+        """Disconnect the document from the session."""
+        self.doc.OnApplyOperation.remove(self.local_operation)
+        self.doc.OnRefreshView.remove(self.sync)
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+        if self.doc.session is self:
+            self.doc.session = None
+        info('Left session')
+
+
+def host(doc, path):
+    """Host a session on the unix socket at path with the text of doc, and join it."""
+    server = SessionServer(path, doc.text)
+    server.start()
+    join(doc, path)
+    return server
+
+
+def join(doc, path):
+    """Join the session served on the unix socket at path."""
+    if doc.session != None:
+        doc.session.leave()
+    doc.session = SessionClient(doc, path)
+    return doc.session
+
+
+def leave(doc):
+    """Leave the session the document is in, if any."""
+    if doc.session != None:
+        doc.session.leave()
+
+
+def init(doc):
+    doc.session = None
+
+Document.OnDocumentInit.add(init)
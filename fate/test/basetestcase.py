@@ -27,6 +27,8 @@ class Foo(Bar):
         with open(destination, 'w') as f:
             f.write(self.sampletext)
         self.document = document.Document(destination)
+        # Keep tests independent of undo history stored by earlier runs
+        self.document.persistent_undo = False
         document.activedocument = self.document
 
     def tearDown(self):
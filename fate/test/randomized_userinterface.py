@@ -8,6 +8,7 @@ from ..document import Document
 from ..filecommands import open_file, quit_document, force_quit, quit_all
 from ..errorchecking import checkerrors
 from ..formatting import formattext
+from ..undotree import undo_to_time, redo_to_time
 
 # All keys that can be entered by the user simulator
 key_list = list(
@@ -21,7 +22,7 @@ key_list = list(
 
 command_dict = publics(commands)
 forbidden_commands = [open_file, quit_document, force_quit, quit_all, formattext,
-                      checkerrors]
+                      checkerrors, undo_to_time, redo_to_time]
 for c in forbidden_commands:
     command_dict.pop(c.__name__)
 
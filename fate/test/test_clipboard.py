@@ -15,3 +15,9 @@ class ClipboardTest(BaseTestCase):
         commands.undo(self.document)
         self.assertEqual('import sys', self.document.text[:10])
 
+    def test_copy_materialises(self):
+        # The clipboard doesn't keep the text revision alive
+        copy(self.document)
+        content = self.document.clipboard.peek()
+        self.assertEqual(['import'], content)
+        self.assertIs(str, type(content[0]))
@@ -0,0 +1,36 @@
+from ..operators import Insert, delete
+from .. import commands, commandmode
+from .basetestcase import BaseTestCase
+
+
+class TransactionTest(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        commands.selectnextword(self.document)
+
+    def test_transaction(self):
+        doc = self.document
+        fired = []
+        doc.OnTextChanged.add(lambda doc: fired.append('text'))
+        doc.OnSelectionChange.add(lambda doc: fired.append('selection'))
+
+        with doc.transaction():
+            Insert('Foo ')(doc)
+            delete(doc)
+            Insert('Bar')(doc)
+            self.assertEqual([], fired)
+        self.assertEqual(['text', 'selection'], fired)
+        self.assertEqual('Bar sys', doc.text[:7])
+
+        commands.undo(doc)
+        self.assertEqual('import sys', doc.text[:10])
+
+    def test_evaluate_undo(self):
+        doc = self.document
+        Insert('Foo')(doc)
+        self.assertEqual(None, commandmode.evaluate(doc, 'undo'))
+        self.assertEqual('import sys', doc.text[:10])
+        self.assertEqual(None, commandmode.evaluate(doc, 'redo'))
+        self.assertEqual('Fooimport', doc.text[:9])
+        commandmode.evaluate(doc, 'undo_to_time(60)')
+        self.assertEqual('import sys', doc.text[:10])
@@ -0,0 +1,49 @@
+from ..selection import Interval, Selection
+from ..document import Document
+from .. import document, documentsearch
+from .basetestcase import BaseTestCase
+
+
+class DocumentSearchTest(BaseTestCase):
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.other = Document()
+        self.other.text = 'no match\nself.pass = 1\n'
+        self.search = documentsearch.start_search(r'\bpass\b')
+        self.results = self.search.results
+
+    def tearDown(self):
+        self.results.quit()
+        self.other.quit()
+        BaseTestCase.tearDown(self)
+
+    def test_listing(self):
+        self.assertTrue(self.search.wait(timeout=10))
+        self.assertIs(self.results, document.activedocument)
+        listing = self.results.text.splitlines()
+        untitled = '[untitled {}]'.format(document.documentlist.index(self.other))
+        self.assertIn(self.document.filename + ':5:9:         pass', listing)
+        self.assertIn(self.document.filename + ':6:9:         pass', listing)
+        self.assertIn(untitled + ':2:6: self.pass = 1', listing)
+        self.assertEqual(len(self.search.entries), len(listing))
+
+        # The listing itself is not searched again
+        search = documentsearch.start_search('pass')
+        search.wait(timeout=10)
+        self.assertNotIn(self.results, [entry[0] for entry in search.entries])
+        search.results.quit()
+
+    def test_goto_search_result(self):
+        self.search.wait(timeout=10)
+        line = [entry[0] for entry in self.search.entries].index(self.other)
+        start = sum(len(text) + 1 for text in self.results.text.splitlines()[:line])
+        self.results.selection = Selection(Interval(start, start))
+        self.results.processinput('\n')
+        self.assertIs(self.other, document.activedocument)
+        self.assertEqual(Selection(Interval(14, 18)), self.other.selection)
+
+        # The match can't be found anymore after deleting it
+        self.other.text = ''
+        self.results.processinput('\n')
+        self.assertEqual(Selection(Interval(14, 18)), self.other.selection)
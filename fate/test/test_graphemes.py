@@ -0,0 +1,81 @@
+from itertools import islice
+from ..graphemes import segment, previous_boundary, next_boundary, clusters
+from .. import graphemes
+from ..selection import Interval, Selection
+from ..insertoperations import changeinplace
+from .. import commands
+from .. import document
+from .. import run
+from .basetestcase import BaseTestCase
+
+
+def deactivate(doc):
+    document.activedocument = None
+
+
+class GraphemeTest(BaseTestCase):
+
+    sampletext = 'e\u0301te\u0301 \U0001F44D\U0001F3FD \U0001F1F3\U0001F1F1\nok\n'
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+
+    def test_segment(self):
+        self.assertEqual([0, 2, 3, 5, 6, 8, 9, 11, 12, 13, 14, 15],
+                         segment(self.sampletext))
+        self.assertEqual([0, 1, 3, 4], segment('a\r\nb'))
+        # Emoji joined by zero width joiners form a single cluster
+        self.assertEqual([0, 5], segment('\U0001F468\u200d\U0001F469\u200d\U0001F467'))
+        # Hangul jamo form a syllable
+        self.assertEqual([0, 3, 4], segment('\u1100\u1161\u11a8\uac00'))
+
+    def test_boundaries(self):
+        text = self.sampletext
+        self.assertEqual(0, previous_boundary(text, 2))
+        self.assertEqual(0, previous_boundary(text, 1))
+        self.assertEqual(2, next_boundary(text, 0))
+        self.assertEqual(11, next_boundary(text, 9))
+        self.assertEqual(9, previous_boundary(text, 11))
+
+    def test_long_line(self):
+        # Only the characters around the position are looked at
+        text = 'e\u0301' * 100000
+        looked_up = []
+        property_of = graphemes.property_of
+        graphemes.property_of = lambda char: looked_up.append(char) or property_of(char)
+        try:
+            self.assertEqual(100000, previous_boundary(text, 100001))
+            self.assertEqual(100002, next_boundary(text, 100001))
+            self.assertEqual([(100000, 100002), (99998, 100000)],
+                             list(islice(clusters(text, 100001, reverse=True), 2)))
+            self.assertEqual([(100000, 100002), (100002, 100004)],
+                             list(islice(clusters(text, 100001), 2)))
+        finally:
+            graphemes.property_of = property_of
+        self.assertLess(len(looked_up), 100)
+
+    def test_character_motions(self):
+        doc = self.document
+        commands.selectnextchar(doc)
+        self.assertEqual(Selection([Interval(0, 2)]), doc.selection)
+        commands.selectnextchar(doc)
+        self.assertEqual(Selection([Interval(2, 3)]), doc.selection)
+
+        doc.selection = Selection([Interval(9, 9)])
+        commands.selectnextchar(doc)
+        self.assertEqual(Selection([Interval(9, 11)]), doc.selection)
+        commands.selectpreviouschar(doc)
+        self.assertEqual(Selection([Interval(8, 9)]), doc.selection)
+        commands.selectpreviouschar(doc)
+        self.assertEqual(Selection([Interval(6, 8)]), doc.selection)
+
+    def test_backspace(self):
+        doc = self.document
+        doc.selection = Selection([Interval(8, 8)])
+        doc.ui.feedinput(changeinplace)
+        for char in ['a\u0301', '\b', 'b', '\b', '\b', '\b']:
+            doc.ui.feedinput(char)
+        doc.ui.feedinput(doc.cancelkey)
+        doc.ui.feedinput(deactivate)
+        run()
+        self.assertEqual('e\u0301te\u0301 \U0001F1F3\U0001F1F1\nok\n', doc.text)
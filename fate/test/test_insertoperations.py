@@ -5,6 +5,7 @@ Auto indentation is covered.
 from .. import commands
 from ..insertoperations import changeafter, changebefore, changeinplace, changearound
 from ..undotree import undo
+from ..selection import Interval, Selection
 from .basetestcase import BaseTestCase
 from .. import document
 from .. import run
@@ -79,3 +80,45 @@ class OperatorTest(BaseTestCase):
         undo(self.document)
         self.assertEqual('import sys\n\n', self.document.text[:12])
 
+
+    def test_input_burst(self):
+        mode = self.document.modes.changeinplace
+        updates = []
+        update_operation = mode.update_operation
+        mode.update_operation = lambda doc: updates.append(update_operation(doc))
+
+        self.document.ui.feedinput(changeinplace)
+        for char in 'pasted text':
+            self.document.ui.feedinput(char)
+        self.document.ui.feedinput(self.document.cancelkey)
+        self.document.ui.feedinput(deactivate)
+        run()
+        del mode.update_operation
+
+        self.assertEqual('pasted text\n', self.document.text[:12])
+        # One update when starting the mode and one for the whole burst
+        self.assertEqual(2, len(updates))
+
+    def test_preview_delta(self):
+        doc = self.document
+        text = doc.text
+        doc.selection = Selection(Interval(len(text) - 7, len(text) - 2))
+        applied = []
+        doc.OnApplyOperation.add(lambda doc, operation, oldtext, newtext:
+                                 applied.append(operation))
+
+        doc.ui.feedinput(changeinplace)
+        for char in ['x', 'y', '\b', 'del']:
+            doc.ui.feedinput(char)
+        doc.ui.feedinput(doc.cancelkey)
+        doc.ui.feedinput(deactivate)
+        run()
+
+        # Deleting past the preview is bounded by the original text
+        self.assertEqual(text[:-7] + 'x\n', doc.text)
+        # After the first preview, only the difference with the previous preview is
+        # applied: inserting x (the y is backspaced in the same burst), then deleting
+        # the newline
+        self.assertEqual([['', 'x'], ['x\n', 'x']],
+                         [[str(operation.old_content[0]), str(operation.newcontent[0])]
+                          for operation in applied[1:3]])
@@ -0,0 +1,49 @@
+from ..selection import Interval, Selection
+from .. import document
+from .. import run
+from .basetestcase import BaseTestCase
+
+
+def deactivate(doc):
+    document.activedocument = None
+
+
+class MacroTest(BaseTestCase):
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+
+    def feed(self, keys):
+        for key in keys:
+            self.document.ui.feedinput(key)
+        self.document.ui.feedinput(deactivate)
+        document.activedocument = self.document
+        run()
+
+    def test_record(self):
+        doc = self.document
+        self.feed(['q', 'a', 'w', '2', 'w', 'q'])
+        self.assertEqual(Selection([Interval(12, 17)]), doc.selection)
+        inputs, steps = doc.ui.macro_data.registers['a']
+        self.assertEqual([], inputs)
+        self.assertEqual([None, 2], [step.count for step in steps])
+        self.assertEqual([['w'], ['2', 'w']], [step.keys for step in steps])
+
+    def test_play(self):
+        doc = self.document
+        # Replace the next word by X, including the input for insert mode
+        self.feed(['q', 'b', 'w', 'c', 'X', 'esc', 'q'])
+        self.assertEqual('X sys', doc.text[:5])
+        self.feed(['3', '@', 'b'])
+        self.assertEqual('X X\n\nX X(Bar):', doc.text[:14])
+
+        # The three replays are undone at once
+        self.feed(['u'])
+        self.assertEqual('X sys\n\nclass Foo(Bar):', doc.text[:22])
+
+    def test_nested_play(self):
+        doc = self.document
+        self.feed(['q', 'a', 'w', 'q', 'q', 'b', '@', 'a', '@', 'a', 'q'])
+        self.assertEqual(Selection([Interval(12, 17)]), doc.selection)
+        self.feed(['@', 'b'])
+        self.assertEqual(Selection([Interval(22, 25)]), doc.selection)
@@ -0,0 +1,52 @@
+import re
+from ..selecting.matchindex import MatchIndex, line_local
+from ..operators import Insert
+from ..selection import Interval, Selection
+from .. import commands
+from .basetestcase import BaseTestCase
+
+
+class MatchIndexTest(BaseTestCase):
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.index = MatchIndex(self.document)
+
+    def assertMatches(self, pattern):
+        starts, ends = self.index.find(pattern)
+        self.assertEqual([match.span() for match in re.finditer(pattern, self.document.text)],
+                         list(zip(starts, ends)))
+
+    def test_line_local(self):
+        for pattern in ['pass', r'\bself\w*', r'(?i)(?:def|class) \w+', r'Foo\(']:
+            self.assertTrue(line_local(pattern))
+        for pattern in [r'pass\n', r'\s+', r'[^a]', '(?s).', r'(?=x)', 'pass$', r'\x0a']:
+            self.assertFalse(line_local(pattern))
+
+    def test_follow_operations(self):
+        self.assertEqual(([60, 73], [64, 77]), self.index.find('pass'))
+        self.document.selection = Selection([Interval(58, 62), Interval(80, 81)])
+        Insert('pass\npa')(self.document)
+        self.assertMatches('pass')
+        # Patterns that may look at other lines are matched in the whole text
+        self.assertMatches(r'pass\s+p')
+
+    def test_search(self):
+        doc = self.document
+        messages = []
+        doc.ui.notify = messages.append
+        doc.search_pattern = 'pass'
+        doc.selection = Selection(Interval(0, 1))
+        commands.search_next(doc)
+        self.assertEqual(Selection(Interval(60, 64)), doc.selection)
+        commands.search_next(doc)
+        self.assertEqual(Selection(Interval(73, 77)), doc.selection)
+        commands.search_previous(doc)
+        self.assertEqual(Selection(Interval(60, 64)), doc.selection)
+        self.assertEqual(['Match 1 of 2', 'Match 2 of 2', 'Match 1 of 2'], messages)
+
+        # All matches within the selection are selected at once
+        doc.selection = Selection(Interval(50, 80))
+        commands.search_next(doc)
+        self.assertEqual(Selection([Interval(60, 64), Interval(73, 77)]), doc.selection)
+        self.assertEqual('Matches 1 to 2 of 2', messages[-1])
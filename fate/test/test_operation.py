@@ -0,0 +1,41 @@
+from ..selection import Interval, Selection
+from ..operation import Operation
+from ..operators import Insert, delete
+from ..commandtools import compose
+from .. import commands
+from .basetestcase import BaseTestCase
+
+
+class OperationTest(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        commands.selectnextword(self.document)
+
+    def test_compose(self):
+        doc = self.document
+        first = Operation(doc, ['from'])
+        first.do(doc)
+        doc.selection = Selection([Interval(0, 4), Interval(5, 8)])
+        second = Operation(doc, ['FROM', ''])
+        second.do(doc)
+        expected = doc.text
+
+        composed = first.compose(second)
+        composed.undo(doc)
+        self.assertEqual('import sys', doc.text[:10])
+        self.assertEqual(Selection([Interval(0, 6)]), doc.selection)
+
+        composed.do(doc)
+        self.assertEqual(expected, doc.text)
+        self.assertEqual(Selection([Interval(0, 4), Interval(5, 5)]), doc.selection)
+
+    def test_collapse_sequence(self):
+        command = compose(Insert('Foo '), delete, Insert('Bar'))
+        command(self.document)
+        self.assertEqual('Bar sys', self.document.text[:7])
+        self.assertEqual(1, len(self.document.undotree.current_node.commands))
+
+        commands.undo(self.document)
+        self.assertEqual('import sys', self.document.text[:10])
+        commands.redo(self.document)
+        self.assertEqual('Bar sys', self.document.text[:7])
@@ -0,0 +1,40 @@
+import re
+from unittest import TestCase
+from .. import patterns
+from ..patterns import PatternRegistry
+from ..selecting.selectpattern import SYNC_FUNCTIONS
+
+
+class PatternRegistryTest(TestCase):
+
+    def test_lru(self):
+        registry = PatternRegistry(maxsize=2)
+        first = registry.compile('a+')
+        self.assertIs(first, registry.compile('a+'))
+        registry.compile('b+')
+        # Using a+ makes b+ the least recently used pattern
+        registry.compile('a+')
+        registry.compile('c+')
+        self.assertEqual([('a+', 0), ('c+', 0)], list(registry.regexes))
+        self.assertEqual((2, 3, 1), (registry.hits, registry.misses, registry.evictions))
+        self.assertEqual(0.4, registry.hit_rate)
+
+        registry.resize(1)
+        self.assertEqual([('c+', 0)], list(registry.regexes))
+
+    def test_pinned(self):
+        registry = PatternRegistry(maxsize=1)
+        registry.precompile([r'\w+'])
+        registry.compile('x')
+        registry.compile('y')
+        self.assertEqual(re.compile(r'\w+'), registry.compile(r'\w+'))
+        self.assertEqual(1, registry.hits)
+
+    def test_invalid_pattern(self):
+        registry = PatternRegistry()
+        self.assertRaises(re.error, registry.compile, '(')
+        self.assertEqual(0, len(registry.regexes))
+
+    def test_builtin_patterns(self):
+        for pattern in SYNC_FUNCTIONS:
+            self.assertIn((pattern, 0), patterns.registry.pinned)
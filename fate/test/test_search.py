@@ -0,0 +1,87 @@
+from ..selection import Interval, Selection
+from .. import search, commands
+from ..selecting.selectorcache import selectorcache
+from .basetestcase import BaseTestCase
+
+
+class SearchPromptTest(BaseTestCase):
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.document.selection = Selection(Interval(50, 50))
+        self.messages = []
+        self.document.ui.notify = self.messages.append
+
+    def feed(self, keys):
+        for key in keys:
+            self.document.processinput(key)
+
+    def test_incremental_search(self):
+        doc = self.document
+        self.feed(['/', 'p'])
+        self.assertEqual(Selection(Interval(60, 61)), doc.selection)
+        self.feed(['a', 's', 's'])
+        self.assertEqual(Selection(Interval(60, 64)), doc.selection)
+        self.feed(['\b', '\b'])
+        self.assertEqual(Selection(Interval(60, 62)), doc.selection)
+        self.feed(['\n'])
+        self.assertEqual('pa', doc.search_pattern)
+        self.assertEqual(Selection(Interval(60, 62)), doc.selection)
+        self.feed(['n'])
+        self.assertEqual(Selection(Interval(73, 75)), doc.selection)
+
+    def test_cancel(self):
+        doc = self.document
+        doc.search_pattern = 'pass'
+        self.feed(['/', 's', 'e', 'l', 'f'])
+        self.assertEqual(Selection(Interval(93, 97)), doc.selection)
+        self.feed(['esc'])
+        self.assertEqual(Selection(Interval(50, 50)), doc.selection)
+        # The previous pattern is kept
+        self.assertEqual('pass', doc.search_pattern)
+        self.assertIs(doc.modes.normalmode, doc.mode)
+
+    def test_not_found(self):
+        doc = self.document
+        self.feed(['/', 'x', 'y', '\n'])
+        self.assertEqual(Selection(Interval(50, 50)), doc.selection)
+        self.assertEqual('Pattern not found: xy', self.messages[-1])
+
+    def test_interrupted_search(self):
+        doc = self.document
+        chunk_size = search.CHUNK_SIZE
+        search.CHUNK_SIZE = 1
+        try:
+            # Input arrives after searching the first chunk
+            answers = iter([False])
+            doc.ui.inputpending = lambda: next(answers, True)
+            self.feed(['/', 'r'])
+            self.assertEqual(Selection(Interval(50, 50)), doc.selection)
+            self.assertEqual(52, doc.modes.searchprompt.states[-1].pos)
+
+            # The search continues where it was abandoned
+            self.feed(['e', '\n'])
+            self.assertEqual(Selection(Interval(132, 134)), doc.selection)
+        finally:
+            search.CHUNK_SIZE = chunk_size
+
+
+class LocalFindTest(BaseTestCase):
+
+    def test_cache(self):
+        doc = self.document
+        cache = selectorcache(doc)
+        doc.selection = Selection(Interval(0, 0))
+        doc.ui.feedinput('s')
+        commands.local_find(doc)
+        self.assertEqual(Selection(Interval(7, 8)), doc.selection)
+
+        # The same key gives the same command, so its result is reused
+        hits = cache.hits
+        size = len(cache.results)
+        doc.selection = Selection(Interval(0, 0))
+        doc.ui.feedinput('s')
+        commands.local_find(doc)
+        self.assertEqual(Selection(Interval(7, 8)), doc.selection)
+        self.assertEqual(hits + 1, cache.hits)
+        self.assertEqual(size, len(cache.results))
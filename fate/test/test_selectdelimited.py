@@ -1,6 +1,11 @@
+from random import Random
 from ..selection import Interval, Selection
+from ..operation import Operation
 from ..selecting.selectdelimited import (select_next_delimiting, select_next_delimiting_char,
-                                         select_previous_delimiting)
+                                         select_previous_delimiting,
+                                         select_previous_delimiting_char)
+from ..selecting.pairindex import BracketPairs, BracketPositions
+from ..textindex import PositionList
 from .basetestcase import BaseTestCase
 
 
@@ -46,3 +51,143 @@ class SelectAroundTest(BaseTestCase):
         select_previous_delimiting(doc)
         expected = Selection([Interval(18, 20)])
         self.assertEqual(expected, doc.selection)
+
+
+class NestedPairTest(BaseTestCase):
+
+    sampletext = """f(a(b)c)\n"""
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+
+    def test_nesting(self):
+        doc = self.document
+        doc.selection = Selection([Interval(0, 1)])
+        select_next_delimiting_char(doc, char='(')
+        expected = Selection([Interval(1, 8)])
+        self.assertEqual(expected, doc.selection)
+
+        doc.selection = Selection([Interval(4, 5)])
+        select_previous_delimiting_char(doc, char=')')
+        expected = Selection([Interval(3, 6)])
+        self.assertEqual(expected, doc.selection)
+
+        select_previous_delimiting_char(doc, char=')')
+        expected = Selection([Interval(2, 7)])
+        self.assertEqual(expected, doc.selection)
+
+    def test_follow_operations(self):
+        doc = self.document
+        doc.selection = Selection([Interval(4, 5)])
+        select_previous_delimiting_char(doc, char='(')
+        self.assertEqual(Selection([Interval(3, 6)]), doc.selection)
+
+        doc.selection = Selection([Interval(3, 3)])
+        Operation(doc, [')(']).do(doc)
+        self.assertEqual('f(a)((b)c)\n', doc.text)
+        # The index follows the operation instead of being rebuilt
+        self.assertEqual(1, len(doc.pairindex.pending))
+        self.assertIs(doc.text, doc.pairindex.text)
+
+        doc.selection = Selection([Interval(6, 6)])
+        select_previous_delimiting_char(doc, char='(')
+        expected = Selection([Interval(6, 7)])
+        self.assertEqual(expected, doc.selection)
+        select_previous_delimiting_char(doc, char='(')
+        expected = Selection([Interval(5, 8)])
+        self.assertEqual(expected, doc.selection)
+        select_previous_delimiting_char(doc, char='(')
+        expected = Selection([Interval(5, 9)])
+        self.assertEqual(expected, doc.selection)
+
+
+class QuotePairTest(BaseTestCase):
+
+    sampletext = """# don't\nx = 'a'\n"""
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+
+    def test_stray_quote(self):
+        # A stray quote doesn't affect the pairing of the quotes after it
+        doc = self.document
+        doc.selection = Selection([Interval(10, 10)])
+        select_next_delimiting_char(doc, char='\'')
+        self.assertEqual(Selection([Interval(12, 15)]), doc.selection)
+
+        doc.selection = Selection([Interval(13, 13)])
+        select_previous_delimiting_char(doc, char='\'')
+        self.assertEqual(Selection([Interval(13, 14)]), doc.selection)
+
+
+class PositionListTest(BaseTestCase):
+
+    def test_splice(self):
+        positions = list(range(0, 3000, 3))
+        plist = PositionList(positions)
+        random = Random(0)
+        for _ in range(200):
+            beg = random.randrange(3000)
+            end = beg + random.randrange(20)
+            new = sorted(random.sample(range(beg, beg + 30), random.randrange(10)))
+            delta = 30 - (end - beg)
+            plist.splice(beg, end, new, delta)
+            positions = ([pos for pos in positions if pos < beg] + new +
+                         [pos + delta for pos in positions if pos >= end])
+            self.assertEqual(positions, list(plist))
+
+        pos = positions[len(positions) // 2]
+        self.assertEqual(positions[len(positions) // 2:], list(plist.after(pos)))
+        self.assertEqual(positions[len(positions) // 2 - 1::-1], list(plist.before(pos)))
+
+
+class BracketPairsTest(BaseTestCase):
+
+    def enclosing_pair(self, text, beg, end):
+        """Find the enclosing pair by walking over the text in both directions."""
+        depth = 0
+        openings = []
+        for pos in range(beg - 1, -1, -1):
+            if text[pos] == ')':
+                depth += 1
+            elif text[pos] == '(':
+                if depth:
+                    depth -= 1
+                else:
+                    openings.append(pos)
+        depth = 0
+        closings = []
+        for pos in range(beg, len(text)):
+            if text[pos] == '(':
+                depth += 1
+            elif text[pos] == ')':
+                if depth:
+                    depth -= 1
+                else:
+                    closings.append(pos)
+        for opened, closed in zip(openings, closings):
+            if closed >= end:
+                return opened, closed + 1
+
+    def test_enclosing_pair(self):
+        random = Random(0)
+        finder = lambda text: [i for i, char in enumerate(text) if char in '()']
+        text = ''.join(random.choice('(()x)') for _ in range(400))
+        # Small blocks, such that the pairs span many blocks
+        positions = BracketPositions([], '(')
+        positions.block_size = 4
+        positions.replace_blocks(0, 0, finder(text))
+        for _ in range(50):
+            beg = random.randrange(len(text))
+            end = beg + random.randrange(5)
+            content = ''.join(random.choice('()x') for _ in range(random.randrange(5)))
+            positions.update(Operation.from_content(Selection(Interval(beg, end)),
+                                                    [text[beg:end]], [content]), finder)
+            text = text[:beg] + content + text[end:]
+
+            pairs = BracketPairs(text, positions, '(', ')')
+            for _ in range(20):
+                beg = random.randrange(len(text))
+                end = beg + random.randrange(20)
+                self.assertEqual(self.enclosing_pair(text, beg, end),
+                                 pairs.enclosing_pair(beg, end))
@@ -0,0 +1,66 @@
+from unittest import TestCase
+from random import Random
+from ..selection import Interval, Selection
+
+
+def merged(intervals):
+    """Merge overlapping and adjacent intervals the straightforward way."""
+    result = []
+    for beg, end in sorted(intervals):
+        if result and beg <= result[-1][1]:
+            result[-1] = Interval(result[-1][0], max(end, result[-1][1]))
+        else:
+            result.append(Interval(beg, end))
+    return result
+
+
+class SelectionTest(TestCase):
+
+    def test_add(self):
+        # Touching intervals are merged, disjoint intervals are not
+        self.assertEqual([Interval(0, 4)], list(Selection([Interval(0, 2), Interval(2, 4)])))
+        self.assertEqual([Interval(0, 2), Interval(3, 4)],
+                         list(Selection([Interval(0, 2), Interval(3, 4)])))
+        self.assertEqual([Interval(0, 5)], list(Selection([Interval(0, 3), Interval(2, 5)])))
+        self.assertEqual([Interval(0, 3)], list(Selection([Interval(0, 3), Interval(3, 3)])))
+
+        # Adding intervals out of order
+        selection = Selection([Interval(5, 6), Interval(0, 1)])
+        self.assertEqual([Interval(0, 1), Interval(5, 6)], list(selection))
+        selection.add(Interval(2, 5))
+        self.assertEqual([Interval(0, 1), Interval(2, 6)], list(selection))
+        selection.add(Interval(1, 2))
+        self.assertEqual([Interval(0, 6)], list(selection))
+
+    def test_add_random(self):
+        random = Random(0)
+        for _ in range(200):
+            intervals = []
+            for _ in range(random.randrange(1, 8)):
+                beg = random.randrange(30)
+                intervals.append(Interval(beg, beg + random.randrange(4)))
+            expected = merged(intervals)
+            self.assertEqual(expected, list(Selection(sorted(intervals))))
+            random.shuffle(intervals)
+            self.assertEqual(expected, list(Selection(intervals)))
+
+    def test_overlapping(self):
+        selection = Selection([Interval(0, 2), Interval(4, 6), Interval(8, 10)])
+        # Touching intervals count as overlapping
+        self.assertEqual(slice(0, 2), selection.overlapping(2, 4))
+        self.assertEqual(slice(1, 3), selection.overlapping(6, 8))
+        self.assertEqual(slice(1, 2), selection.overlapping(5, 5))
+        self.assertEqual(slice(0, 3), selection.overlapping(1, 9))
+        # Disjoint intervals don't
+        self.assertEqual(slice(1, 1), selection.overlapping(3, 3))
+        self.assertEqual(slice(3, 3), selection.overlapping(11, 12))
+        self.assertEqual(slice(0, 0), Selection().overlapping(0, 1))
+
+        random = Random(0)
+        for _ in range(200):
+            beg = random.randrange(12)
+            end = beg + random.randrange(4)
+            indices = [i for i, (ibeg, iend) in enumerate(selection)
+                       if ibeg <= end and beg <= iend]
+            result = selection.overlapping(beg, end)
+            self.assertEqual(indices, list(range(result.start, result.stop)))
@@ -1,7 +1,15 @@
 from ..selection import Interval, Selection
-from .. import commands
+from .. import commands, document, run
+from ..operation import Operation
+from ..selecting import selectpattern
+from ..selecting.selectorcache import selectorcache
 from .basetestcase import BaseTestCase
 
+
+def deactivate(doc):
+    document.activedocument = None
+
+
 class SelectorTest(BaseTestCase):
     def setUp(self):
         BaseTestCase.setUp(self)
@@ -16,3 +24,105 @@ class SelectorTest(BaseTestCase):
         expected = Selection([Interval(0, 6)])
         self.assertEqual(expected, self.document.selection)
 
+
+    def test_previous_word_far_away(self):
+        # The previous word lies outside of the first window that is scanned
+        text = self.document.text
+        self.document.text = text + ' ' * (2 * selectpattern.WINDOW_SIZE) + '\n'
+        end = len(self.document.text) - 1
+        self.document.selection = Selection([Interval(end, end)])
+        commands.selectpreviousword(self.document)
+        expected = Selection([Interval(text.index('1'), text.index('1') + 1)])
+        self.assertEqual(expected, self.document.selection)
+
+    def test_findpattern_around(self):
+        text = self.document.text
+        for pattern in selectpattern.SYNC_FUNCTIONS:
+            matches = selectpattern.findpattern(text, pattern)
+            for pos in range(len(text) + 1):
+                # Forward we get all matches from some match that ends before pos
+                forward = list(selectpattern.findpattern_around(text, pattern, pos))
+                self.assertEqual(matches[len(matches) - len(forward):], forward)
+                self.assertTrue(all(mend <= pos
+                                    for _, mend in matches[:len(matches) - len(forward)]))
+                # Backward we get exactly the matches that start at or before pos
+                backward = list(selectpattern.findpattern_around(text, pattern, pos, True))
+                expected = [interval for interval in reversed(matches) if interval[0] <= pos]
+                self.assertEqual(expected, backward)
+
+    def test_words_after_operation(self):
+        doc = self.document
+        commands.selectnextword(doc)
+        # Join the first two words and split the second
+        doc.selection = Selection([Interval(6, 8), Interval(14, 15)])
+        Operation(doc, ['_', ' ']).do(doc)
+        self.assertEqual(1, len(doc.boundaryindex.pending))
+        self.assertEqual('import_ys\n\ncl ss Foo', doc.text[:20])
+
+        doc.selection = Selection([Interval(0, 0)])
+        commands.selectnextword(doc)
+        self.assertEqual(Selection([Interval(0, 9)]), doc.selection)
+        commands.selectnextword(doc)
+        self.assertEqual(Selection([Interval(11, 13)]), doc.selection)
+        commands.selectnextclass(doc)
+        self.assertEqual(Selection([Interval(13, 14)]), doc.selection)
+        commands.selectnextword(doc)
+        self.assertEqual(Selection([Interval(14, 16)]), doc.selection)
+        commands.selectpreviousword(doc)
+        self.assertEqual(Selection([Interval(11, 13)]), doc.selection)
+
+    def test_batched_intervals(self):
+        doc = self.document
+        selection = Selection([Interval(0, 0), Interval(13, 17), Interval(40, 41),
+                               Interval(70, 72)])
+        for selector in [selectpattern.selectnextword, selectpattern.selectpreviousline,
+                         selectpattern.selectfullline, selectpattern.selectindent]:
+            expected = [selector(doc, interval) for interval in selection]
+            self.assertEqual(expected, selector.batch(doc, list(selection)))
+
+    def test_cache(self):
+        doc = self.document
+        cache = selectorcache(doc)
+        first = commands.selectnextline(doc, preview=True)
+        hits = cache.hits
+        self.assertEqual(first, commands.selectnextline(doc, preview=True))
+        self.assertEqual(hits + 1, cache.hits)
+
+        # Changing the text invalidates the results
+        revision = doc.revision
+        doc.text = 'x' + doc.text
+        self.assertEqual(revision + 1, doc.revision)
+        misses = cache.misses
+        self.assertNotEqual(first, commands.selectnextline(doc, preview=True))
+        self.assertEqual(misses + 1, cache.misses)
+
+    def test_counted_motions(self):
+        doc = self.document
+        start = Selection([Interval(20, 22), Interval(60, 60)])
+        for command in [commands.selectnextword, commands.selectpreviousword,
+                        commands.selectnextclass, commands.selectnextline,
+                        commands.selectpreviousfullline, commands.selectpreviouschar]:
+            expected = start
+            for _ in range(3):
+                expected = command(doc, selection=expected, preview=True)
+            self.assertEqual(expected, command.counted(doc, 3, selection=start,
+                                                       preview=True))
+
+        # Moving down keeps the column, even when passing shorter lines
+        self.assertEqual(Selection([Interval(73, 75), Interval(87, 87)]),
+                         commands.movedown.counted(doc, 3, selection=start,
+                                                   preview=True))
+        # Counts beyond the last line move as far as possible
+        self.assertEqual(Selection([Interval(len(doc.text), len(doc.text))]),
+                         commands.movedown.counted(doc, 100, selection=start,
+                                                   preview=True))
+
+    def test_count_prefix(self):
+        doc = self.document
+        doc.selection = Selection([Interval(0, 0)])
+        for key in ['3', 'j', '2', 'w', '1', '0', 'k']:
+            doc.ui.feedinput(key)
+        doc.ui.feedinput(deactivate)
+        run()
+        self.assertEqual(Selection([Interval(8, 10)]), doc.selection)
+        self.assertEqual(None, doc.modes.normalmode.count)
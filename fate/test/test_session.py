@@ -0,0 +1,86 @@
+from tempfile import mkdtemp
+from shutil import rmtree
+from time import sleep
+from .. import commands, document, session
+from ..operators import Insert
+from ..selection import Selection, Interval
+from ..transform import transform, apply
+from .basetestcase import BaseTestCase
+
+
+class TransformTest(BaseTestCase):
+    def test_transform(self):
+        text = 'import sys'
+        first = [6, 'os, ', 4]
+        second = [-7, 3]
+        first_prime, second_prime = transform(first, second)
+        expected = 'os, sys'
+        self.assertEqual(expected, apply(apply(text, first), second_prime))
+        self.assertEqual(expected, apply(apply(text, second), first_prime))
+
+
+class SessionTest(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.directory = mkdtemp()
+        self.server = session.host(self.document, self.directory + '/session')
+        self.other = document.Document(self.document.filename)
+        session.join(self.other, self.directory + '/session')
+
+    def tearDown(self):
+        session.leave(self.other)
+        session.leave(self.document)
+        self.server.shutdown()
+        self.server.server_close()
+        self.other.quit()
+        BaseTestCase.tearDown(self)
+        rmtree(self.directory)
+
+    def converge(self):
+        for _ in range(1000):
+            for doc in (self.document, self.other):
+                doc.session.wait()
+            if (self.document.session.revision == self.other.session.revision
+                    == self.server.revision):
+                return
+            sleep(0.001)
+
+    def test_concurrent_edits(self):
+        doc, other = self.document, self.other
+        doc.selection = Selection(Interval(0, 0))
+        Insert('# ')(doc)
+        other.selection = Selection(Interval(7, 10))
+        commands.delete(other)
+        other.selection = Selection(Interval(7, 7))
+        Insert('os')(other)
+
+        self.converge()
+        self.assertEqual('# import os\n', doc.text[:12])
+        self.assertEqual(doc.text, other.text)
+        self.assertEqual(doc.text, self.server.text)
+        # The selection of the other document has moved along with the remote edit
+        self.assertEqual(Selection(Interval(9, 11)), other.selection)
+
+    def test_undo_own_edits(self):
+        doc, other = self.document, self.other
+        other.selection = Selection(Interval(7, 10))
+        commands.delete(other)
+        other.selection = Selection(Interval(7, 7))
+        Insert('os')(other)
+        self.converge()
+        doc.selection = Selection(Interval(0, 0))
+        Insert('# ')(doc)
+        self.converge()
+        self.assertEqual('# import os\n', other.text[:12])
+
+        # Undo reverts the edits of the user, and keeps the remote edit
+        commands.undo(other)
+        self.assertEqual('# import \n', other.text[:10])
+        commands.undo(other)
+        self.assertEqual('# import sys\n', other.text[:13])
+        self.assertIs(other.undotree.root, other.undotree.current_node)
+        self.converge()
+        self.assertEqual(doc.text, other.text)
+
+        commands.undo(doc)
+        self.assertEqual('import sys\n', doc.text[:11])
@@ -0,0 +1,76 @@
+from unittest import skipIf
+from ..textarray import TextArray, NumpyTextArray, numpy
+from ..navigation import coord_to_position, position_to_coord
+from ..operators import Insert
+from ..selection import Interval, Selection
+from .basetestcase import BaseTestCase
+
+
+class TextArrayTest(BaseTestCase):
+
+    sampletext = '\nfoo bar_1\n\n\n  baz(qux)\n\u00e9t\u00e9  x\n\nend\n'
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.textarray = TextArray(self.document)
+
+    def assertBoundaries(self, expected, boundaries):
+        self.assertEqual(expected, [list(map(int, positions))
+                                    for positions in boundaries])
+
+    def test_lines(self):
+        textarray = self.textarray
+        self.assertEqual(8, textarray.count_newlines())
+        self.assertEqual(2, textarray.count_newlines(1, 12))
+        self.assertEqual([0, 1, 11, 12, 13, 24, 31, 32, 36],
+                         list(map(int, textarray.line_starts())))
+        self.assertEqual(11, textarray.line_start(2))
+        self.assertEqual(0, textarray.line_of(0))
+        self.assertEqual(1, textarray.line_of(10))
+        self.assertEqual(4, textarray.line_of(15))
+        self.assertEqual(8, textarray.line_of(36))
+
+    def test_paragraphs(self):
+        self.assertBoundaries([[1, 13, 32], [11, 31, 36]],
+                              self.textarray.paragraph_boundaries())
+
+    def test_follow_operations(self):
+        doc = self.document
+        textarray = self.textarray
+        self.assertEqual(8, textarray.count_newlines())
+        textarray.line_starts()
+        doc.selection = Selection([Interval(2, 6), Interval(12, 12), Interval(30, 33)])
+        Insert('x\ny')(doc)
+        Insert('\n')(doc)
+        # The operations are followed instead of rebuilding the array
+        self.assertEqual(2, len(textarray.pending))
+        self.assertIs(doc.text, textarray.text)
+
+        self.assertEqual(doc.text.count('\n'), textarray.count_newlines())
+        self.assertEqual(doc.text.count('\n', 3, 20), textarray.count_newlines(3, 20))
+        expected = [0] + [i + 1 for i, char in enumerate(doc.text) if char == '\n']
+        self.assertEqual(expected, list(map(int, textarray.line_starts())))
+
+    def test_coordinates(self):
+        doc = self.document
+        # Plain strings are scanned instead
+        for text in (doc, doc.text):
+            self.assertEqual(14, coord_to_position(5, 2, text))
+            self.assertEqual((5, 2), position_to_coord(14, text))
+            self.assertEqual((8, 4), position_to_coord(35, text))
+            self.assertEqual(len(doc.text) - 1, coord_to_position(20, 1, text, crop=True))
+            self.assertRaises(ValueError, coord_to_position, 20, 1, text)
+        self.assertEqual((2, 3), position_to_coord(4, 'a\nbcd'))
+
+
+@skipIf(numpy == None, 'NumPy is not installed')
+class NumpyTextArrayTest(TextArrayTest):
+
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.textarray = NumpyTextArray(self.document)
+
+    def test_newlines(self):
+        text = self.document.text
+        self.assertEqual([char == '\n' for char in text],
+                         self.textarray.newlines().tolist())
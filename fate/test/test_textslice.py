@@ -0,0 +1,37 @@
+from unittest import TestCase
+from ..textslice import TextSlice
+
+
+class TextSliceTest(TestCase):
+
+    def setUp(self):
+        self.text = 'import sys\nprint(sys.argv)\n'
+        self.slice = TextSlice(self.text, 7, 20)
+
+    def test_str_and_len(self):
+        self.assertEqual('sys\nprint(sys', str(self.slice))
+        self.assertEqual(13, len(self.slice))
+        # Boundaries are clipped to the text
+        self.assertEqual(self.text[20:], str(TextSlice(self.text, 20, 100)))
+        self.assertEqual(0, len(TextSlice(self.text, 5, 2)))
+
+    def test_slicing(self):
+        piece = self.slice[4:9]
+        self.assertIsInstance(piece, TextSlice)
+        self.assertIs(self.text, piece.text)
+        self.assertEqual('print', str(piece))
+        self.assertEqual('ys', str(self.slice[-2:]))
+        self.assertEqual('', str(self.slice[9:4]))
+        self.assertEqual('s\ni(s', self.slice[0:13:3])
+        self.assertEqual('s', self.slice[0])
+        self.assertEqual('s', self.slice[-1])
+        with self.assertRaises(IndexError):
+            self.slice[13]
+
+    def test_comparison(self):
+        self.assertEqual('sys\nprint(sys', self.slice)
+        self.assertEqual(TextSlice('xsys\nprint(sys', 1, 14), self.slice)
+        self.assertNotEqual('sys', self.slice)
+        self.assertEqual(hash('sys\nprint(sys'), hash(self.slice))
+        self.assertEqual('>sys', '>' + self.slice[:3])
+        self.assertEqual('sys<', self.slice[:3] + '<')
@@ -0,0 +1,95 @@
+from tempfile import mkdtemp
+from shutil import rmtree
+from time import sleep
+from .. import commands, document, undopersistence
+from ..operators import Insert
+from .basetestcase import BaseTestCase
+
+
+class UndoPersistenceTest(BaseTestCase):
+    def setUp(self):
+        self.undo_directory = undopersistence.UNDO_DIRECTORY
+        undopersistence.UNDO_DIRECTORY = mkdtemp() + '/'
+        BaseTestCase.setUp(self)
+        self.document.persistent_undo = True
+
+    def tearDown(self):
+        BaseTestCase.tearDown(self)
+        rmtree(undopersistence.UNDO_DIRECTORY)
+        undopersistence.UNDO_DIRECTORY = self.undo_directory
+
+    def reopen(self):
+        self.document.quit()
+        self.document = document.Document(self.document.filename)
+        self.document.persistent_undo = True
+        return self.document
+
+    def test_restore_history(self):
+        doc = self.document
+        commands.selectnextword(doc)
+        Insert('Foo ')(doc)
+        commands.undo(doc)
+        Insert('Bar ')(doc)
+        commands.save(doc)
+
+        doc = self.reopen()
+        self.assertEqual('Bar import sys', doc.text[:14])
+        commands.undo(doc)
+        self.assertEqual('import sys', doc.text[:10])
+        self.assertEqual(2, len(doc.undotree.current_node.children))
+        doc.undotree.redo(child_index=1)
+        self.assertEqual('Foo import sys', doc.text[:14])
+
+    def test_outdated_history(self):
+        doc = self.document
+        commands.selectnextword(doc)
+        Insert('Foo ')(doc)
+        commands.save(doc)
+        with open(doc.filename, 'w') as fd:
+            fd.write('changed')
+
+        doc = self.reopen()
+        commands.undo(doc)
+        self.assertEqual('changed', doc.text)
+        self.assertEqual(None, doc.undotree.current_node.parent)
+
+    def test_quit_while_writing(self):
+        doc = self.document
+        write_store = undopersistence.write_store
+        def slow_write_store(*args):
+            sleep(0.1)
+            write_store(*args)
+        undopersistence.write_store = slow_write_store
+        try:
+            commands.selectnextword(doc)
+            Insert('Foo ')(doc)
+            commands.save(doc)
+            thread = doc.undo_store_thread
+            doc.quit()
+        finally:
+            undopersistence.write_store = write_store
+        self.assertFalse(thread.is_alive())
+        self.assertFalse(thread.daemon)
+
+        doc = self.document = document.Document(doc.filename)
+        commands.undo(doc)
+        self.assertEqual('import sys', doc.text[:10])
+
+    def test_prune_restored_history(self):
+        doc = self.document
+        for i, string in enumerate(['aaaa', 'bbbb', 'cccc']):
+            if i:
+                commands.undo(doc)
+            commands.emptybefore(doc)
+            Insert(string)(doc)
+            doc.undotree.current_node.created = i
+        commands.save(doc)
+
+        # The most recent branches are stored first, but the oldest is pruned
+        doc = self.reopen()
+        tree = doc.undotree
+        tree.load_history()
+        tree.memory_budget = 11
+        tree.prune()
+        self.assertEqual(['cccc', 'bbbb'], [child.commands[0].newcontent[0]
+                                            for child in tree.root.children])
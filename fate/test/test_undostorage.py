@@ -0,0 +1,42 @@
+from .. import commands
+from ..operation import Operation
+from ..selection import Selection, Interval
+from ..undostorage import CompressedText
+from .basetestcase import BaseTestCase
+
+
+class UndoStorageTest(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.payloads = self.document.undotree.payloads
+        self.payloads.compress_threshold = 8
+
+    def replace_all(self, newtext):
+        # Leave the last newline alone
+        selection = Selection(Interval(0, len(self.document.text) - 1))
+        Operation(self.document, [newtext], selection)(self.document)
+
+    def test_compress_and_spill(self):
+        doc = self.document
+        original = doc.text[:-1]
+        self.replace_all('formatted')
+        self.replace_all(original)
+        self.replace_all('formatted')
+        self.replace_all('x')
+
+        operations = [node.commands[0] for node in doc.undotree.root.subtree()
+                      if node.commands]
+        first, second, third, _ = operations
+        self.assertTrue(isinstance(first.old_content[0], CompressedText))
+        # Identical contents are shared
+        self.assertTrue(first.old_content[0] is second.newcontent[0])
+        self.assertTrue(first.newcontent[0] is third.newcontent[0])
+
+        self.payloads.spill_after = 0
+        self.payloads.spill()
+        self.assertFalse(first.old_content[0].isresident)
+
+        for _ in range(4):
+            commands.undo(doc)
+        self.assertEqual(original + '\n', doc.text)
+        self.assertTrue(first.old_content[0].isresident)
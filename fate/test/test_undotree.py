@@ -0,0 +1,192 @@
+from .. import commands
+from ..undotree import undo_to_time, redo_to_time
+from ..operators import Insert
+from ..selection import Selection, Interval
+from ..transform import from_components
+from .basetestcase import BaseTestCase
+
+
+class UndoTreeTest(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.tree = self.document.undotree
+
+    def insert(self, string):
+        commands.emptybefore(self.document)
+        Insert(string)(self.document)
+
+    def test_prune_abandoned(self):
+        doc = self.document
+        self.insert('abandoned')
+        commands.undo(doc)
+        for _ in range(4):
+            self.insert('0123')
+        self.assertEqual(9 + 16, self.tree.usage)
+
+        self.tree.memory_budget = 24
+        self.tree.prune()
+        self.assertEqual(16, self.tree.usage)
+        self.assertEqual(1, len(self.tree.root.children))
+
+        # The path to the current node is still valid
+        for _ in range(4):
+            commands.undo(doc)
+        self.assertEqual('import sys', doc.text[:10])
+
+    def test_prune_oldest(self):
+        doc = self.document
+        self.tree.pruning_policy = 'oldest'
+        self.insert('0123')
+        self.insert('4567')
+        commands.undo(doc)
+        self.insert('89')
+
+        self.tree.memory_budget = 7
+        self.tree.prune()
+        self.assertEqual(2, self.tree.usage)
+        self.assertEqual(self.tree.root, self.tree.current_node.parent)
+
+        commands.undo(doc)
+        commands.undo(doc)
+        self.assertEqual('0123import sys', doc.text[:14])
+
+    def test_pinned_revision(self):
+        doc = self.document
+        self.tree.payloads.compress_threshold = 4
+        text = doc.text
+        commands.selectnextword(doc)
+        commands.delete(doc)
+        # The deleted word is a slice that keeps the whole text alive until it is stored
+        self.assertEqual(len(text), self.tree.usage)
+        self.insert('ab')
+        self.assertEqual(len('import') + 2, self.tree.usage)
+
+    def test_jump(self):
+        doc = self.document
+        self.tree.checkpoint_interval = 4
+        texts = [doc.text]
+        for i in range(10):
+            self.insert(str(i))
+            texts.append(doc.text)
+        leaf = self.tree.current_node
+        for _ in range(3):
+            commands.undo(doc)
+        self.insert('branch')
+        branch = self.tree.current_node
+
+        self.tree.jump(self.tree.root)
+        self.assertEqual(texts[0], doc.text)
+        self.tree.jump(leaf)
+        self.assertEqual(texts[10], doc.text)
+        self.tree.jump(branch)
+        self.assertEqual('branch' + texts[7], doc.text)
+
+        # A jump via a checkpoint leaves the same text and selection as undo does
+        self.tree.jump(leaf)
+        self.tree.jump(leaf.parent.parent)
+        self.assertNotEqual(None, self.tree.current_node.checkpoint)
+        selection = doc.selection
+        self.tree.jump(leaf)
+        commands.undo(doc)
+        commands.undo(doc)
+        self.assertEqual(texts[8], doc.text)
+        self.assertEqual(selection, doc.selection)
+
+    def test_checkpoints(self):
+        doc = self.document
+        self.tree.checkpoint_interval = 1
+        self.tree.max_checkpoints = 4
+        for i in range(20):
+            self.insert(str(i))
+        # The checkpoints are spread over the whole depth of the tree
+        self.assertEqual([4, 8, 12, 16], sorted(node.depth for node in self.tree.checkpoints))
+        checkpoint_size = sum(len(node.checkpoint) for node in self.tree.checkpoints)
+        self.assertEqual(10 * 1 + 10 * 2 + checkpoint_size, self.tree.usage)
+
+        # Pruned nodes don't keep their checkpoints
+        self.tree.pruning_policy = 'oldest'
+        self.tree.memory_budget = self.tree.usage - 1
+        self.tree.prune()
+        self.assertLess(self.tree.usage, self.tree.memory_budget)
+        self.assertEqual(self.tree.root.subtree_size(), self.tree.usage)
+        self.assertEqual([12, 16], sorted(node.depth for node in self.tree.checkpoints))
+
+    def test_undo_to_time(self):
+        doc = self.document
+        texts = [doc.text]
+        for i in range(5):
+            self.insert(str(i))
+            texts.append(doc.text)
+        # Pretend the nodes were added a minute apart
+        node = self.tree.current_node
+        for i in range(5, -1, -1):
+            node.created = 60 * i
+            node = node.parent
+        self.tree.index_times()
+
+        undo_to_time(170)(doc)
+        self.assertEqual(texts[2], doc.text)
+        undo_to_time(1000)(doc)
+        self.assertEqual(texts[0], doc.text)
+        redo_to_time(120)(doc)
+        self.assertEqual(texts[2], doc.text)
+
+    def test_redo_to_time_branched(self):
+        doc = self.document
+        texts = [doc.text]
+        for i in range(3):
+            self.insert(str(i))
+            texts.append(doc.text)
+        commands.undo(doc)
+        commands.undo(doc)
+        self.insert('branch')
+        branch = self.tree.current_node
+        # Pretend the nodes were added a minute apart, the branch being the last
+        node = self.tree.root
+        for i in range(4):
+            node.created = 60 * i
+            node = node.children[-1] if node.children else None
+        branch.created = 240
+        self.tree.index_times()
+
+        # The most recent node before the moment is on the abandoned branch,
+        # but redo follows the branch
+        self.tree.jump(self.tree.root)
+        redo_to_time(200)(doc)
+        self.assertEqual(texts[1], doc.text)
+        redo_to_time(180)(doc)
+        self.assertIs(branch, self.tree.current_node)
+        self.assertEqual('branch' + texts[1], doc.text)
+
+    def test_rebase(self):
+        doc = self.document
+        text = doc.text
+        for i in range(50):
+            doc.selection = Selection(Interval(2 * i, 2 * i))
+            Insert('x')(doc)
+        nodes = list(self.tree.timeline)
+        contents = [node.commands[0].newcontent for node in nodes[1:]]
+        append = from_components([len(doc.text) - 1, '# end\n', 1], doc.text)
+        prepend = from_components(['# start\n', len(doc.text)], doc.text)
+
+        # Only the operations are transformed, so the text is not read and the time
+        # index is not rebuilt, and operations that stay in place are kept
+        class UnreadableText(str):
+            def __getitem__(self, index):
+                raise AssertionError('The text is read')
+        doc.text = UnreadableText(doc.text)
+        self.tree.index_times = None
+        commands_before = [node.commands[0] for node in nodes[1:]]
+        self.tree.rebase(append)
+        self.assertEqual(commands_before, [node.commands[0] for node in nodes[1:]])
+        self.tree.rebase(prepend)
+        self.assertEqual(contents, [node.commands[0].newcontent for node in nodes[1:]])
+        self.assertEqual(nodes, self.tree.timeline)
+        del self.tree.index_times
+
+        doc.text = str(doc.text)
+        append.do(doc)
+        prepend.do(doc)
+        for _ in range(50):
+            commands.undo(doc)
+        self.assertEqual('# start\n' + text[:-1] + '# end\n' + text[-1], doc.text)
@@ -0,0 +1,204 @@
+"""
+This module contains a view of the text of a document as an array of code points,
+which answers questions about lines and paragraphs of the whole text at once.
+Words are found in the boundary index of the selecting package.
+
+NumPy is an optional dependency. If it is installed, the text is converted to an
+array of code points, from which the mask of the newlines is computed, and all
+answers are obtained with vectorised operations. This keeps navigating files of
+hundreds of megabytes responsive.
+Otherwise, the same answers are computed with the regular expressions and string
+methods of Python. The tests of the NumPy version are skipped if NumPy is missing.
+
+Answers are computed when they are asked for. Operations splice the array and the
+line starts, while the other answers are dropped and computed again when needed.
+"""
+import re
+from bisect import bisect_right
+
+from .textindex import TextIndex
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NEWLINE_REGEX = re.compile('\n')
+PARAGRAPH_REGEX = re.compile(r'(?s)(?:[^\n][\n]?)+')
+
+
+class TextArray(TextIndex):
+
+    """
+    Lines and paragraphs of the text of a document, computed in pure Python.
+    Positions are returned as sorted sequences of ints.
+    """
+    # Each operation shifts the line starts after it, which takes about a third of the
+    # time of finding them again (half, for NumPy), so only a few operations are
+    # followed
+    max_pending = 2
+
+    def __init__(self, doc):
+        TextIndex.__init__(self, doc)
+        self.cache = {}
+
+    def build(self, text):
+        self.cache = {}
+
+    def update(self, operation):
+        # The line starts are spliced, other answers are computed again when needed
+        cache = self.cache
+        self.cache = {}
+        if 'line_starts' in cache:
+            self.cache['line_starts'] = self.splice_line_starts(cache['line_starts'],
+                                                                operation)
+
+    def splice_line_starts(self, starts, operation):
+        """Return the line starts after operation, given the line starts before it."""
+        result = []
+        last = 0
+        offset = 0
+        for (beg, end), content in zip(operation.oldselection, operation.newcontent):
+            content = str(content)
+            i = bisect_right(starts, beg, last)
+            result.extend(start + offset for start in starts[last:i])
+            result.extend(beg + offset + match.end()
+                          for match in NEWLINE_REGEX.finditer(content))
+            offset += len(content) - (end - beg)
+            last = bisect_right(starts, end, i)
+        result.extend(start + offset for start in starts[last:])
+        return result
+
+    def cached(self, name, compute):
+        """Return the answer with given name, computing it if necessary."""
+        self.refresh()
+        try:
+            return self.cache[name]
+        except KeyError:
+            result = self.cache[name] = compute()
+            return result
+
+    def count_newlines(self, beg=0, end=None):
+        """Return the number of newlines in the interval from beg to end."""
+        self.refresh()
+        end = len(self.text) if end == None else end
+        return self.text.count('\n', beg, end)
+
+    def line_starts(self):
+        """Return the positions at which the lines start, including 0."""
+        def compute():
+            starts = [0]
+            starts.extend(match.end() for match in NEWLINE_REGEX.finditer(self.text))
+            return starts
+        return self.cached('line_starts', compute)
+
+    def line_start(self, line):
+        """Return the position at which the line with given (0-based) index starts."""
+        return int(self.line_starts()[line])
+
+    def line_of(self, pos):
+        """Return the (0-based) index of the line containing pos."""
+        return bisect_right(self.line_starts(), pos) - 1
+
+    def paragraph_boundaries(self):
+        """
+        Return the starts and ends of the paragraphs, i.e. the maximal pieces of text
+        without empty lines, including their last newline.
+        """
+        return self.cached('paragraphs', lambda: self.boundaries(PARAGRAPH_REGEX))
+
+    def boundaries(self, regex):
+        starts, ends = [], []
+        for match in regex.finditer(self.text):
+            starts.append(match.start())
+            ends.append(match.end())
+        return starts, ends
+
+
+class NumpyTextArray(TextArray):
+
+    """
+    Lines and paragraphs of the text of a document, computed by NumPy.
+    Positions are returned as arrays of integers.
+    """
+
+    def build(self, text):
+        TextArray.build(self, text)
+        self.codes = encode(text)
+
+    def update(self, operation):
+        pieces = []
+        last = 0
+        for (beg, end), content in zip(operation.oldselection, operation.newcontent):
+            pieces.append(self.codes[last:beg])
+            pieces.append(encode(str(content)))
+            last = end
+        pieces.append(self.codes[last:])
+        self.codes = numpy.concatenate(pieces)
+        TextArray.update(self, operation)
+
+    def splice_line_starts(self, starts, operation):
+        pieces = []
+        last = 0
+        offset = 0
+        for (beg, end), content in zip(operation.oldselection, operation.newcontent):
+            content = str(content)
+            i = int(numpy.searchsorted(starts, beg, side='right'))
+            pieces.append(starts[last:i] + offset)
+            pieces.append(numpy.array([beg + offset + match.end()
+                                       for match in NEWLINE_REGEX.finditer(content)],
+                                      dtype=starts.dtype))
+            offset += len(content) - (end - beg)
+            last = int(numpy.searchsorted(starts, end, side='right'))
+        pieces.append(starts[last:] + offset)
+        return numpy.concatenate(pieces)
+
+    def newlines(self):
+        """Return the mask of the newlines in the text."""
+        return self.cached('newlines', lambda: self.codes == ord('\n'))
+
+    def count_newlines(self, beg=0, end=None):
+        # The line starts are kept up to date with operations, unlike the mask
+        starts = self.line_starts()
+        end = len(self.text) if end == None else end
+        return int(numpy.searchsorted(starts, end, side='right')
+                   - numpy.searchsorted(starts, beg, side='right'))
+
+    def line_starts(self):
+        def compute():
+            return numpy.concatenate(([0], numpy.flatnonzero(self.newlines()) + 1))
+        return self.cached('line_starts', compute)
+
+    def line_of(self, pos):
+        return int(numpy.searchsorted(self.line_starts(), pos, side='right')) - 1
+
+    def paragraph_boundaries(self):
+        def compute():
+            # A newline at the start of the text or after another newline
+            # is an empty line, which separates paragraphs
+            newlines = self.newlines()
+            previous = numpy.concatenate(([True], newlines[:-1]))
+            return runs(~(newlines & previous))
+        return self.cached('paragraphs', compute)
+
+
+def encode(text):
+    """Return the array of code points of text."""
+    # Lone surrogates are kept, such that positions correspond to the text
+    return numpy.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+
+
+def runs(mask):
+    """Return the starts and ends of the maximal runs of True in mask."""
+    padded = numpy.concatenate(([False], mask, [False])).astype(numpy.int8)
+    changes = numpy.diff(padded)
+    return numpy.flatnonzero(changes == 1), numpy.flatnonzero(changes == -1)
+
+
+def textarray(doc):
+    """Return the text array of doc, creating it if it doesn't exist yet."""
+    try:
+        return doc.textarray
+    except AttributeError:
+        doc.textarray = NumpyTextArray(doc) if numpy != None else TextArray(doc)
+        return doc.textarray
@@ -0,0 +1,161 @@
+"""
+This module contains the base class for indices on the text of a document.
+
+An index is built when it is used for the first time.
+Afterwards, it follows the operations that are applied to the document,
+which are applied to the index instead of rebuilding it.
+The operations are only applied when the index is used again, so an index that
+is not used costs next to nothing while typing.
+If the text is changed in any other way, the index is rebuilt when it is used again.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+
+class TextIndex(ABC):
+
+    """
+    Base class for an index on the text of a document.
+    Subclasses implement build(text), which builds the index from scratch,
+    and update(operation), which brings the index up to date with an operation.
+    Call refresh() before using the index.
+    """
+    # When more operations are pending, rebuilding is probably cheaper
+    max_pending = 64
+
+    def __init__(self, doc):
+        self.doc = doc
+        # The text that is described by the index after the pending operations
+        self.text = None
+        self.pending = []
+        doc.OnApplyOperation.add(self.apply_operation)
+
+    def apply_operation(self, doc, operation, oldtext, newtext):
+        """Handler for OnApplyOperation."""
+        # Operations can only be followed if they form a chain from the indexed text
+        if self.text is oldtext and len(self.pending) < self.max_pending:
+            self.pending.append(operation)
+            self.text = newtext
+        else:
+            self.text = None
+            self.pending = []
+
+    def refresh(self):
+        """Bring the index up to date with the text of the document."""
+        text = self.doc.text
+        if self.text is not text:
+            self.pending = []
+            self.build(text)
+            self.text = text
+        elif self.pending:
+            pending, self.pending = self.pending, []
+            for operation in pending:
+                self.update(operation)
+
+    @abstractmethod
+    def build(self, text):
+        """Build the index from scratch for text."""
+        pass
+
+    @abstractmethod
+    def update(self, operation):
+        """Bring the index up to date with an operation on the indexed text."""
+        pass
+
+
+class PositionList:
+
+    """
+    Sorted list of positions in a text, which can follow an edit of the text without
+    shifting each position after it.
+    The positions are stored in blocks, and each block has an offset that is added to
+    the positions in it. An edit only rebuilds the blocks around the modified interval,
+    and changes the offsets of the blocks after it.
+    """
+    block_size = 256
+
+    def __init__(self, positions=()):
+        self.blocks = []
+        self.offsets = []
+        # The first position of each block, including its offset
+        self.firsts = []
+        self.replace_blocks(0, 0, list(positions))
+
+    def __len__(self):
+        return sum(len(block) for block in self.blocks)
+
+    def __iter__(self):
+        return self.after(0)
+
+    def replace_blocks(self, lo, hi, positions):
+        """Replace the blocks from lo to hi by blocks containing positions."""
+        size = self.block_size
+        blocks = [positions[i:i + size] for i in range(0, len(positions), size)]
+        self.blocks[lo:hi] = blocks
+        self.offsets[lo:hi] = [0] * len(blocks)
+        self.firsts[lo:hi] = [block[0] for block in blocks]
+
+    def locate(self, pos):
+        """Return the block and the index in it of the first position at or after pos."""
+        b = max(0, bisect_right(self.firsts, pos) - 1)
+        if b == len(self.blocks):
+            return b, 0
+        i = bisect_left(self.blocks[b], pos - self.offsets[b])
+        if i == len(self.blocks[b]):
+            return b + 1, 0
+        return b, i
+
+    def after(self, pos):
+        """Generate the positions at or after pos in ascending order."""
+        b, i = self.locate(pos)
+        while b < len(self.blocks):
+            offset = self.offsets[b]
+            for position in islice(self.blocks[b], i, None):
+                yield position + offset
+            b += 1
+            i = 0
+
+    def before(self, pos):
+        """Generate the positions before pos in descending order."""
+        b, i = self.locate(pos)
+        while b >= 0:
+            if b < len(self.blocks):
+                offset = self.offsets[b]
+                block = self.blocks[b]
+                for j in range(i - 1, -1, -1):
+                    yield block[j] + offset
+            b -= 1
+            if b >= 0:
+                i = len(self.blocks[b])
+
+    def splice(self, beg, end, positions, delta):
+        """
+        Remove the positions from beg to end, insert positions, which lie in the new
+        content of this interval, and shift the positions at or after end by delta.
+        """
+        b, i = self.locate(beg)
+        c, j = self.locate(end)
+        head = tail = []
+        if b < len(self.blocks):
+            head = [position + self.offsets[b] for position in self.blocks[b][:i]]
+        if c < len(self.blocks):
+            tail = [position + self.offsets[c] + delta for position in self.blocks[c][j:]]
+        hi = min(c + 1, len(self.blocks))
+        for k in range(hi, len(self.blocks)):
+            self.offsets[k] += delta
+            self.firsts[k] += delta
+        self.replace_blocks(b, hi, head + list(positions) + tail)
+
+    def update(self, operation, find):
+        """
+        Follow operation, where find(content) returns the positions in the new content
+        relative to the content.
+        """
+        offset = 0
+        for (beg, end), content in zip(operation.oldselection, operation.newcontent):
+            content = str(content)
+            delta = len(content) - (end - beg)
+            self.splice(beg + offset, end + offset,
+                        [beg + offset + position for position in find(content)], delta)
+            offset += delta
@@ -0,0 +1,65 @@
+"""
+This module contains the TextSlice class, which lazily refers to a part of a text.
+
+Slicing a string copies the sliced content.
+For large regions, e.g. when deleting most of a big file, this doubles the
+memory usage while the content may never be looked at again.
+Since strings are immutable, a text revision never changes once it has been replaced,
+so we can instead store a reference to the text together with the boundaries of the
+slice, and only materialise the content when it is actually read.
+"""
+
+
+class TextSlice:
+
+    """
+    Lazy slice of an immutable text revision.
+    Use str() to materialise the content.
+    Concatenation with strings is supported and results in a string.
+    """
+    __slots__ = ('text', 'beg', 'end')
+
+    def __init__(self, text, beg, end):
+        self.text = text
+        self.beg = max(0, beg)
+        self.end = max(self.beg, min(len(text), end))
+
+    def __str__(self):
+        return self.text[self.beg:self.end]
+
+    def __repr__(self):
+        return 'TextSlice({!r})'.format(str(self))
+
+    def __len__(self):
+        return self.end - self.beg
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return TextSlice(self.text, self.beg + start, self.beg + max(start, stop))
+            return str(self)[index]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('TextSlice index out of range')
+        return self.text[self.beg + index]
+
+    def __eq__(self, other):
+        if isinstance(other, (str, TextSlice)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __add__(self, other):
+        if isinstance(other, (str, TextSlice)):
+            return str(self) + str(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, (str, TextSlice)):
+            return str(other) + str(self)
+        return NotImplemented
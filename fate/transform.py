@@ -0,0 +1,406 @@
+"""
+This module provides operational transformation for operations.
+
+When two operations are made concurrently on the same text, e.g. by two users of a
+shared document, one of them has to be adjusted before it can be applied after the
+other. This adjustment is called transformation.
+
+Transformation is done on a representation of operations as a list of components,
+which covers the whole text, like in ot.js:
+- a positive integer n retains n characters,
+- a negative integer -n deletes n characters,
+- a string inserts that string.
+The components are normalized: consecutive components of the same kind are merged,
+and an insertion always precedes a deletion at the same position.
+"""
+from .operation import Operation
+from .selection import Selection, Interval
+from .textslice import TextSlice
+
+
+def _retain(components, n):
+    if n == 0:
+        return
+    if components and isinstance(components[-1], int) and components[-1] > 0:
+        components[-1] += n
+    else:
+        components.append(n)
+
+
+def _insert(components, string):
+    if not string:
+        return
+    if components and isinstance(components[-1], str):
+        components[-1] += string
+    elif components and isinstance(components[-1], int) and components[-1] < 0:
+        # Insert before the deletion
+        if len(components) > 1 and isinstance(components[-2], str):
+            components[-2] += string
+        else:
+            components.insert(len(components) - 1, string)
+    else:
+        components.append(string)
+
+
+def _delete(components, n):
+    if n == 0:
+        return
+    if components and isinstance(components[-1], int) and components[-1] < 0:
+        components[-1] -= n
+    else:
+        components.append(-n)
+
+
+def base_length(components):
+    """Return the length of the text the components apply to."""
+    return sum(abs(c) for c in components if isinstance(c, int))
+
+
+def apply(text, components):
+    """Apply components to text and return the result."""
+    if base_length(components) != len(text):
+        raise ValueError('Components do not match the length of the text')
+    result = []
+    pos = 0
+    for component in components:
+        if isinstance(component, str):
+            result.append(component)
+        elif component > 0:
+            result.append(text[pos:pos + component])
+            pos += component
+        else:
+            pos -= component
+    return ''.join(result)
+
+
+def transform(components1, components2):
+    """
+    Transform two lists of components that apply to the same text.
+    Return (components1', components2') such that applying components1 and then
+    components2' gives the same result as applying components2 and then components1'.
+    Insertions of components1 end up before insertions of components2 at the
+    same position.
+    """
+    if base_length(components1) != base_length(components2):
+        raise ValueError('Both components must apply to a text of the same length')
+
+    prime1 = []
+    prime2 = []
+    ops1 = iter(components1)
+    ops2 = iter(components2)
+    op1 = next(ops1, None)
+    op2 = next(ops2, None)
+    while op1 != None or op2 != None:
+        if isinstance(op1, str):
+            _insert(prime1, op1)
+            _retain(prime2, len(op1))
+            op1 = next(ops1, None)
+            continue
+        if isinstance(op2, str):
+            _retain(prime1, len(op2))
+            _insert(prime2, op2)
+            op2 = next(ops2, None)
+            continue
+        if op1 == None or op2 == None:
+            raise ValueError('Components are too short')
+
+        if op1 > 0 and op2 > 0:
+            # Both retain
+            length = min(op1, op2)
+            _retain(prime1, length)
+            _retain(prime2, length)
+        elif op1 < 0 and op2 < 0:
+            # Both delete, so there is nothing left to delete for either
+            length = min(-op1, -op2)
+        elif op1 < 0:
+            length = min(-op1, op2)
+            _delete(prime1, length)
+        else:
+            length = min(op1, -op2)
+            _delete(prime2, length)
+
+        op1 = op1 - length if op1 > 0 else op1 + length
+        op2 = op2 - length if op2 > 0 else op2 + length
+        if op1 == 0:
+            op1 = next(ops1, None)
+        if op2 == 0:
+            op2 = next(ops2, None)
+
+    return prime1, prime2
+
+
+def transform_positions(components, positions):
+    """
+    Map a sorted list of positions in the text before applying the components
+    to positions in the resulting text.
+    Positions inside deleted text move to the start of the deletion,
+    and positions at an insertion move to after the inserted text.
+    """
+    result = []
+    old = new = 0
+    components = iter(components)
+    component = next(components, None)
+    for position in positions:
+        while component != None:
+            if isinstance(component, str):
+                new += len(component)
+            elif component > 0:
+                if old + component > position:
+                    break
+                old += component
+                new += component
+            else:
+                if old - component > position:
+                    break
+                old -= component
+            component = next(components, None)
+        if component != None and isinstance(component, int) and component > 0:
+            result.append(new + position - old)
+        else:
+            result.append(new)
+    return result
+
+
+def transform_selection(selection, components):
+    """Map a selection through the components."""
+    positions = [position for interval in selection for position in interval]
+    positions = transform_positions(components, positions)
+    return Selection([Interval(positions[i], positions[i + 1])
+                      for i in range(0, len(positions), 2)])
+
+
+def to_components(operation, length):
+    """Convert an operation on a text of given length into components."""
+    components = []
+    pos = 0
+    for (beg, end), old, new in zip(operation.oldselection, operation.old_content,
+                                    operation.newcontent):
+        _retain(components, beg - pos)
+        _insert(components, str(new))
+        _delete(components, len(old))
+        pos = end
+    _retain(components, length - pos)
+    return components
+
+
+def _edits(components):
+    """
+    Return the intervals of the base text that the components modify,
+    and the strings that replace them.
+    """
+    intervals = []
+    newcontent = []
+    pos = 0
+    previous_retained = True
+    for component in components:
+        if isinstance(component, int) and component > 0:
+            pos += component
+            previous_retained = True
+            continue
+
+        if previous_retained:
+            intervals.append(Interval(pos, pos))
+            newcontent.append('')
+            previous_retained = False
+        if isinstance(component, str):
+            newcontent[-1] += component
+        else:
+            pos -= component
+            intervals[-1] = Interval(intervals[-1][0], pos)
+    return intervals, newcontent
+
+
+def _from_edits(intervals, newcontent, length):
+    """Convert the edits of a text of given length into components."""
+    components = []
+    pos = 0
+    for (beg, end), new in zip(intervals, newcontent):
+        _retain(components, beg - pos)
+        _insert(components, new)
+        _delete(components, end - beg)
+        pos = end
+    _retain(components, length - pos)
+    return components
+
+
+def from_components(components, text):
+    """
+    Convert components on text into an operation.
+    Return None if the components don't modify anything.
+    """
+    intervals, newcontent = _edits(components)
+    if not intervals:
+        return None
+    old_content = [TextSlice(text, beg, end) for beg, end in intervals]
+    return Operation.from_content(Selection(intervals), old_content, newcontent)
+
+
+def invert(components, deleted):
+    """
+    Return the components that undo components, given the concatenation of the
+    strings that the components delete.
+    """
+    result = []
+    pos = 0
+    for component in components:
+        if isinstance(component, str):
+            _delete(result, len(component))
+        elif component > 0:
+            _retain(result, component)
+        else:
+            _insert(result, deleted[pos:pos - component])
+            pos -= component
+    return result
+
+
+def _shift(selection, shift):
+    return Selection([Interval(beg + shift, end + shift) for beg, end in selection])
+
+
+def transform_past(operation, components):
+    """
+    Transform an operation that has been applied to a text, over components that
+    apply to the resulting text, e.g. an operation of another user.
+    Return (operation', components'), where components' applies to the text before
+    the operation and operation' applies after components', such that undoing
+    operation' reverts only the changes of operation. If nothing is left of the
+    operation, operation' is None.
+    This doesn't need the text, and the contents of the operation are only
+    materialised if the components modify or touch the text it inserted.
+    """
+    edits, strings = _edits(components)
+    if not edits:
+        return operation, components
+
+    # Edits after everything the operation refers to leave it as it is
+    oldselection = operation.oldselection
+    delta = (sum(len(new) for new in operation.newcontent)
+             - sum(end - beg for beg, end in oldselection))
+    first = edits[0][0]
+    before = operation.initial_selection()
+    after = operation.selection_after
+    if (oldselection[-1][1] + delta < first and (after == None or after[-1][1] < first)
+            and before[-1][1] < first - delta):
+        components_prime = list(components)
+        components_prime[0] -= delta
+        return operation, components_prime
+
+    # Edits before everything the operation refers to only move it
+    last = edits[-1][1]
+    if (last < oldselection[0][0] and (after == None or last < after[0][0])
+            and last < before[0][0]):
+        shift = sum(len(string) for string in strings) - sum(end - beg
+                                                             for beg, end in edits)
+        result = Operation.from_content(_shift(oldselection, shift),
+                                        operation.old_content, operation.newcontent)
+        result.selection_before = _shift(before, shift)
+        if after != None:
+            result.selection_after = _shift(after, shift)
+        components_prime = list(components)
+        components_prime[-1] -= delta
+        return result, components_prime
+
+    newselection = operation.compute_newselection()
+
+    # Check whether the edits touch the intervals of the operation
+    touching = False
+    i = 0
+    for beg, end in newselection:
+        while i < len(edits) and edits[i][1] < beg:
+            i += 1
+        if i < len(edits) and edits[i][0] <= end:
+            touching = True
+            break
+
+    if not touching:
+        # Move the edits before the operation, and the operation after the edits
+        moved = []
+        i = 0
+        delta = 0
+        for (beg, end), string in zip(edits, strings):
+            while i < len(newselection) and newselection[i][1] < beg:
+                delta += (newselection[i][1] - newselection[i][0]
+                          - oldselection[i][1] + oldselection[i][0])
+                i += 1
+            moved.append(Interval(beg - delta, end - delta))
+        length = base_length(components) - delta
+        while i < len(newselection):
+            length -= (newselection[i][1] - newselection[i][0]
+                       - oldselection[i][1] + oldselection[i][0])
+            i += 1
+        components_prime = _from_edits(moved, strings, length)
+
+        intervals = []
+        i = 0
+        delta = 0
+        for beg, end in oldselection:
+            while i < len(moved) and moved[i][1] < beg:
+                delta += len(strings[i]) - moved[i][1] + moved[i][0]
+                i += 1
+            intervals.append(Interval(beg + delta, end + delta))
+        result = Operation.from_content(Selection(intervals), operation.old_content,
+                                        operation.newcontent)
+    else:
+        # The text inserted by the operation that is left after the edits
+        kept = []
+        i = 0
+        for (beg, end), new in zip(newselection, operation.newcontent):
+            new = str(new)
+            pos = beg
+            while i < len(edits) and edits[i][0] < end:
+                ebeg, eend = edits[i]
+                if ebeg > pos:
+                    kept.append(new[pos - beg:ebeg - beg])
+                pos = max(pos, eend)
+                if eend > end:
+                    break
+                i += 1
+            if pos < end:
+                kept.append(new[pos - beg:])
+        inverse = to_components(operation.inverse(), base_length(components))
+        inverse_prime, components_prime = transform(inverse, components)
+        rebased = invert(inverse_prime, ''.join(kept))
+
+        intervals, newcontent = _edits(rebased)
+        if not intervals:
+            return None, components_prime
+        deleted = ''.join(c for c in inverse_prime if isinstance(c, str))
+        old_content = []
+        pos = 0
+        for beg, end in intervals:
+            old_content.append(deleted[pos:pos + end - beg])
+            pos += end - beg
+        result = Operation.from_content(Selection(intervals), old_content, newcontent)
+
+    result.selection_before = transform_selection(before, components_prime)
+    result.selection_after = transform_selection(operation.final_selection(), components)
+    return result, components_prime
+
+
+def transform_operations(first, second, text):
+    """
+    Transform two operations on text that were made concurrently.
+    Return (first', second'), where first' applies after second and second'
+    applies after first, such that both orders give the same text.
+    An operation that has nothing left to do is returned as None.
+    """
+    components1 = to_components(first, len(text))
+    components2 = to_components(second, len(text))
+    prime1, prime2 = transform(components1, components2)
+    return (from_components(prime1, apply(text, components2)),
+            from_components(prime2, apply(text, components1)))
+
+
+def rebase(operation, concurrent, text):
+    """
+    Rebase an operation on text over a list of concurrent operations, that are
+    applied to text one after another.
+    Return the operation that applies after the concurrent operations, or None if
+    it has nothing left to do.
+    """
+    components = to_components(operation, len(text))
+    for other in concurrent:
+        other_components = to_components(other, len(text))
+        components, _ = transform(components, other_components)
+        text = apply(text, other_components)
+    return from_components(components, text)
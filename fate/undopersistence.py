@@ -0,0 +1,206 @@
+"""
+This module makes the undo history of a file persistent across sessions.
+
+Whenever a document is saved, its undotree is written to a per-file undo store
+in ~/.fate/undo/, including all branches and the position of the current node.
+The tree is snapshotted in the main thread, which only copies references,
+while encoding, compressing and writing happens in a background thread.
+Quitting the document waits until this thread has finished.
+
+When the file is opened again, the store is loaded lazily, i.e. only when the
+undotree is used for the first time, and only if the hash of the stored text matches
+the text that was read from disk.
+Since every node stores its operations, loading the tree requires no replaying.
+"""
+import json
+import zlib
+from hashlib import sha1
+from os import makedirs, replace
+from os.path import abspath, expanduser, isfile
+from threading import Lock, Thread
+from logging import info, error
+
+from .document import Document
+from .operation import Operation
+from .selection import Selection, Interval
+from .undotree import Node
+from . import undotree  # Dependency
+
+UNDO_DIRECTORY = expanduser('~') + '/.fate/undo/'
+FORMAT_VERSION = 2
+
+_write_lock = Lock()
+_write_counters = {}
+
+
+def text_hash(text):
+    """Return the hash by which a text revision is identified in the undo store."""
+    return sha1(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+def store_path(filename):
+    """Return the path of the undo store belonging to given file."""
+    return UNDO_DIRECTORY + sha1(abspath(filename).encode()).hexdigest()
+
+
+def snapshot(tree):
+    """
+    Return a snapshot of the structure of the tree, or None if the tree contains
+    commands that cannot be stored.
+    Only references are copied, so the snapshot can be encoded in another thread.
+    """
+    nodes = []
+    indices = {}
+    todo = [tree.root]
+    while todo:
+        node = todo.pop()
+        indices[node] = len(nodes)
+        nodes.append(node)
+        todo.extend(reversed(node.children))
+
+    result = []
+    for node in nodes:
+        for command in node.commands:
+            if not isinstance(command, Operation):
+                info('Undo history contains {}, which cannot be stored'.format(command))
+                return None
+        parent = indices[node.parent] if node.parent != None else None
+        result.append((parent, [indices[child] for child in node.children],
+                       list(node.commands), node.created))
+    return result, indices[tree.current_node]
+
+
+def encode_selection(selection):
+    if selection == None:
+        return None
+    return [[beg, end] for beg, end in selection]
+
+
+def decode_selection(intervals):
+    if intervals == None:
+        return None
+    return Selection([Interval(beg, end) for beg, end in intervals])
+
+
+def encode_operation(operation):
+    return [encode_selection(operation.oldselection),
+            [str(content) for content in operation.old_content],
+            [str(content) for content in operation.newcontent],
+            encode_selection(operation.selection_before),
+            encode_selection(operation.selection_after)]
+
+
+def decode_operation(data):
+    oldselection, old_content, newcontent, selection_before, selection_after = data
+    operation = Operation.from_content(decode_selection(oldselection),
+                                       old_content, newcontent)
+    operation.selection_before = decode_selection(selection_before)
+    operation.selection_after = decode_selection(selection_after)
+    return operation
+
+
+def encode(texthash, nodes, current_index):
+    """Encode a snapshot into the compressed contents of an undo store."""
+    data = {
+        'version': FORMAT_VERSION,
+        'hash': texthash,
+        'current': current_index,
+        'nodes': [[parent, children, [encode_operation(command) for command in commands],
+                   created] for parent, children, commands, created in nodes],
+    }
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode())
+
+
+def decode(contents):
+    """Decode the contents of an undo store into a tuple (texthash, root, current)."""
+    data = json.loads(zlib.decompress(contents).decode())
+    if data['version'] != FORMAT_VERSION:
+        raise ValueError('Unknown undo store version {}'.format(data['version']))
+
+    # Parents always precede their children
+    nodes = []
+    for parent, _, _, _ in data['nodes']:
+        nodes.append(Node(nodes[parent] if parent != None else None))
+    for node, (_, children, commands, created) in zip(nodes, data['nodes']):
+        node.children = [nodes[child] for child in children]
+        node.commands = [decode_operation(command) for command in commands]
+        node.created = created
+    return data['hash'], nodes[0], nodes[data['current']]
+
+
+def write_store(path, counter, text, nodes, current_index):
+    """Write an undo store, unless a more recent one has been written already."""
+    try:
+        contents = encode(text_hash(text), nodes, current_index)
+        with _write_lock:
+            if _write_counters.get(path, 0) > counter:
+                return
+            _write_counters[path] = counter
+            makedirs(UNDO_DIRECTORY, exist_ok=True)
+            with open(path + '.tmp', 'wb') as fd:
+                fd.write(contents)
+            replace(path + '.tmp', path)
+    except (OSError, ValueError) as e:
+        error('Could not write undo history: ' + str(e))
+
+
+def save_history(doc):
+    """Write the undotree of doc to its undo store in the background."""
+    if not doc.persistent_undo or not doc.filename:
+        return
+
+    tree = doc.undotree
+    tree.load_history()
+    result = snapshot(tree)
+    if result == None:
+        return
+    nodes, current_index = result
+
+    path = store_path(doc.filename)
+    counter = doc.undo_store_counter = doc.undo_store_counter + 1
+    # The thread is not a daemon, so the interpreter doesn't exit while writing
+    thread = Thread(target=write_store,
+                    args=(path, counter, doc.text, nodes, current_index))
+    thread.start()
+    doc.undo_store_thread = thread
+
+
+def finish_writing(doc):
+    """Wait until the undo store of doc has been written."""
+    if doc.undo_store_thread != None:
+        doc.undo_store_thread.join()
+        doc.undo_store_thread = None
+
+
+def history_loader(text):
+    """Return a loader which restores the stored history if it belongs to text."""
+    def loader(tree):
+        path = store_path(tree.doc.filename)
+        if not tree.doc.persistent_undo or not isfile(path):
+            return
+        try:
+            with open(path, 'rb') as fd:
+                texthash, root, current_node = decode(fd.read())
+        except (OSError, ValueError, KeyError, TypeError, zlib.error) as e:
+            error('Could not read undo history: ' + str(e))
+            return
+
+        if texthash != text_hash(text):
+            info('Stored undo history of {} is outdated'.format(tree.doc.filename))
+            return
+
+        tree.set_history(root, current_node)
+        info('Restored undo history of ' + tree.doc.filename)
+    return loader
+
+
+def init(doc):
+    doc.persistent_undo = True
+    doc.undo_store_counter = 0
+    doc.undo_store_thread = None
+    if doc.filename:
+        doc.undotree.history_loader = history_loader(doc.text)
+    doc.OnWrite.add(save_history)
+    doc.OnQuit.add(finish_writing)
+
+Document.OnDocumentInit.add(init)
@@ -0,0 +1,166 @@
+"""
+This module contains the storage for the content of the operations in the undotree.
+
+Large contents, e.g. resulting from replacing the whole text after formatting,
+dominate the memory usage of the undotree.
+Therefore, contents above a size threshold are compressed, and identical contents
+are shared between operations.
+Compressed contents that have not been used for a while are spilled to a temporary
+file, from which they are loaded back transparently when they are needed again.
+
+Small contents are stored as plain strings, such that they don't keep the
+text revision they were sliced from alive.
+"""
+import zlib
+from hashlib import sha1
+from tempfile import TemporaryFile
+from threading import Lock
+from time import monotonic
+from weakref import WeakValueDictionary
+
+from .textslice import TextSlice
+
+
+class CompressedText:
+
+    """
+    Compressed text, which lives either in memory or in the file of its store.
+    Use str() to obtain the text.
+    Like TextSlice, it supports len(), slicing and concatenation with strings.
+    """
+    __slots__ = ('store', 'digest', 'length', 'data', 'offset', 'size', 'last_access',
+                 '__weakref__')
+
+    def __init__(self, store, data, digest, length):
+        self.store = store
+        self.digest = digest
+        self.length = length
+        self.data = zlib.compress(data)
+        self.size = len(self.data)
+        self.offset = None
+        self.last_access = monotonic()
+
+    def __str__(self):
+        self.last_access = monotonic()
+        data = self.data
+        if data == None:
+            data = self.data = self.store.read(self.offset, self.size)
+        return zlib.decompress(data).decode('utf-8', 'surrogatepass')
+
+    def __repr__(self):
+        return 'CompressedText({} characters)'.format(self.length)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        return str(self)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, CompressedText):
+            return self.digest == other.digest
+        if isinstance(other, (str, TextSlice)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __add__(self, other):
+        if isinstance(other, (str, TextSlice, CompressedText)):
+            return str(self) + str(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, (str, TextSlice, CompressedText)):
+            return str(other) + str(self)
+        return NotImplemented
+
+    @property
+    def isresident(self):
+        return self.data != None
+
+    def spill(self):
+        """Drop the data from memory, after making sure it is in the file."""
+        if self.offset == None:
+            self.offset = self.store.write(self.data)
+        self.data = None
+
+
+class PayloadStore:
+
+    """
+    Storage for the contents of operations.
+    Contents of at least compress_threshold characters are compressed and shared,
+    and spilled to disk after they have not been used for spill_after seconds.
+    """
+    compress_threshold = 4096
+    spill_after = 300
+
+    def __init__(self):
+        # Only the operations refer to the payloads, so they disappear with them
+        self.payloads = WeakValueDictionary()
+        self.file = None
+        self.file_lock = Lock()
+        self.last_spill = monotonic()
+
+    def store(self, content):
+        """Return the representation in which given content should be kept."""
+        if isinstance(content, CompressedText):
+            return content
+        if len(content) < self.compress_threshold:
+            return str(content)
+
+        data = str(content).encode('utf-8', 'surrogatepass')
+        digest = sha1(data).digest()
+        payload = self.payloads.get(digest)
+        if payload == None:
+            payload = CompressedText(self, data, digest, len(content))
+            self.payloads[digest] = payload
+        return payload
+
+    def materialise_small(self, operation):
+        """
+        Replace the TextSlices in operation that are too small to be compressed
+        by plain strings, such that they don't keep their text revision alive.
+        """
+        def materialise(content):
+            if isinstance(content, TextSlice) and len(content) < self.compress_threshold:
+                return str(content)
+            return content
+        operation.old_content = [materialise(content) for content in operation.old_content]
+        operation.newcontent = [materialise(content) for content in operation.newcontent]
+
+    def store_operation(self, operation):
+        """Replace the contents of operation by their stored representation."""
+        operation.old_content = [self.store(content) for content in operation.old_content]
+        operation.newcontent = [self.store(content) for content in operation.newcontent]
+
+    def spill(self):
+        """
+        Spill the payloads that have not been used for a while.
+        To keep this cheap, the payloads are only inspected every once in a while.
+        """
+        now = monotonic()
+        if now - self.last_spill < self.spill_after / 4:
+            return
+        self.last_spill = now
+
+        for payload in list(self.payloads.values()):
+            if payload.isresident and now - payload.last_access > self.spill_after:
+                payload.spill()
+
+    def write(self, data):
+        """Append data to the file and return its offset."""
+        with self.file_lock:
+            if self.file == None:
+                self.file = TemporaryFile(prefix='fate-undo-')
+            offset = self.file.seek(0, 2)
+            self.file.write(data)
+            return offset
+
+    def read(self, offset, size):
+        """Read data from the file."""
+        with self.file_lock:
+            self.file.seek(offset)
+            return self.file.read(size)
@@ -6,35 +6,107 @@ from . import commands
 from .document import Document, next_document, previous_document
 from .filecommands import quit_document, quit_all, open_file, force_quit
 from .mode import Mode
-from logging import debug
+from .operation import Operation, compose_operations
+from .undostorage import PayloadStore
+from .textslice import TextSlice
+from .transform import to_components, transform_past
+from itertools import count, chain
+from heapq import heapify, heappush, heappop
+from bisect import bisect_left, bisect_right
+from time import time
+from logging import debug, info
 
 
 class UndoTree:
 
     """
     Stores the command history as a tree with undo/redo functionality.
+
+    The memory usage of the tree is bounded by memory_budget, measured in characters
+    of stored content. Content that is still a lazy slice of a text revision is
+    charged for the whole revision, since it keeps that revision alive. When the budget is exceeded, nodes are pruned according to
+    the pruning_policy, while the path from the root to current_node stays valid:
+    - 'abandoned' first removes branches that are not on the current path,
+      oldest first, and only then the oldest history on the current path.
+    - 'oldest' removes the oldest nodes first, whether they are on the current path
+      or not.
+    History on the current path is removed by making the next node on the path
+    the new root.
+
+    To be able to jump to distant nodes quickly, the text is remembered as a
+    checkpoint in every visited node at a positive depth that is a multiple of the
+    checkpoint spacing, which starts at checkpoint_interval. When there are more than
+    max_checkpoints checkpoints, the spacing is doubled and the checkpoints that
+    are out of step are dropped, so the checkpoints stay spread over the whole
+    depth of the tree. Checkpoints are charged to the memory budget as well.
+
+    Nodes are indexed by the time they were added, to be able to navigate
+    through the history by time.
     """
     sequence = None
     sequence_depth = 0
+    memory_budget = 2 ** 26
+    pruning_policy = 'abandoned'
+    checkpoint_interval = 64
+    max_checkpoints = 16
 
     def __init__(self, doc):
         self.doc = doc
+        self.usage = 0
         self.root = Node(None)
         self.current_node = self.root
+        self.checkpoints = []
+        # Number of times the checkpoint spacing has been doubled
+        self.spacing_doublings = 0
+        # Sorted creation times and the corresponding nodes
+        self.times = [self.root.created]
+        self.timeline = [self.root]
+        # The contents of the newest node are stored when the next node is attached,
+        # such that they are still plain when the command is executed
+        self.payloads = PayloadStore()
+        self.unstored_node = None
+        # Callable that may restore an earlier history, e.g. from disk
+        # It is executed just before the tree is used for the first time
+        self.history_loader = None
+
+    def load_history(self):
+        """Execute the history loader if this has not happened yet."""
+        if self.history_loader != None:
+            loader = self.history_loader
+            self.history_loader = None
+            loader(self)
+
+    def set_history(self, root, current_node):
+        """Replace the history by the tree with given root."""
+        self.root = root
+        self.current_node = current_node
+        for node in self.checkpoints:
+            node.checkpoint = None
+        self.checkpoints = []
+        self.spacing_doublings = 0
+        for node in root.subtree():
+            self.store(node)
+        self.usage = root.subtree_size()
+        self.index_times()
+        self.prune()
 
     def undo(self):
         """Undo previous command set current_node to its parent."""
+        self.load_history()
         if self.sequence != None:
             # TODO: does this have to be a hard fail?
             raise Exception('Cannot perform undo; a sequence of commands is being added')
 
         if self.current_node.parent:
+            self.remember_text()
             for command in reversed(self.current_node.commands):
                 command.undo(self.doc)
             self.current_node = self.current_node.parent
+            self.remember_text()
 
     def redo(self, child_index=0):
         """Redo most recent next command, or command at child_index if specified."""
+        self.load_history()
         if self.sequence != None:
             # TODO: does this have to be a hard fail?
             raise Exception('Cannot perform redo; a sequence of commands is being added')
@@ -43,19 +115,195 @@ class UndoTree:
             l = len(self.current_node.children)
             assert 0 <= child_index < l
 
+            self.remember_text()
             self.current_node = self.current_node.children[child_index]
             for command in self.current_node.commands:
                 command.do(self.doc)
+            self.remember_text()
+
+    def jump(self, target):
+        """
+        Move to an arbitrary node in the tree, via the lowest common ancestor
+        of the current node and the target.
+        The operations along the path are composed, such that the text is modified
+        only once. If that is cheaper, the text is restored from the nearest checkpoint
+        above the target instead, and only the operations from there on are applied.
+        """
+        self.load_history()
+        if self.sequence != None:
+            raise Exception('Cannot perform jump; a sequence of commands is being added')
+        if target is self.current_node:
+            return
+
+        self.remember_text()
+        up, down = self.path(self.current_node, target)
+        operations = []
+        for node in up:
+            operations.extend(command.inverse() if isinstance(command, Operation)
+                              else command for command in reversed(node.commands))
+        for node in down:
+            operations.extend(node.commands)
+
+        if not all(isinstance(command, Operation) for command in operations):
+            # Other commands cannot be composed, so walk the path step by step
+            for node in up:
+                for command in reversed(node.commands):
+                    command.undo(self.doc)
+            for node in down:
+                for command in node.commands:
+                    command.do(self.doc)
+        elif operations:
+            # Find the nearest checkpoint that is cheaper than replaying the path
+            cost = sum(node.cost() for node in up) + sum(node.cost() for node in down)
+            checkpoint = target
+            checkpoint_cost = 0
+            while checkpoint != None and checkpoint.checkpoint == None:
+                checkpoint_cost += checkpoint.cost()
+                if checkpoint_cost >= cost:
+                    checkpoint = None
+                    break
+                checkpoint = checkpoint.parent
+
+            if checkpoint == None:
+                compose_operations(operations).do(self.doc)
+            else:
+                debug('Jumping via checkpoint at depth {}'.format(checkpoint.depth))
+                _, down = self.path(checkpoint, target)
+                checkpoint_operations = [command for node in down
+                                         for command in node.commands]
+                with self.doc.transaction(group_undo=False):
+                    self.doc.text = checkpoint.checkpoint
+                    if checkpoint_operations:
+                        compose_operations(checkpoint_operations).do(self.doc)
+                    self.doc.selection = operations[-1].final_selection()
+
+        self.current_node = target
+        self.remember_text()
+
+    @staticmethod
+    def path(source, target):
+        """
+        Return the nodes that are left when walking from source to target,
+        and the nodes that are entered, both in the order of walking.
+        """
+        up = []
+        down = []
+        while source is not target:
+            if source == None or target == None:
+                raise ValueError('Nodes are not in the same tree')
+            if source.depth >= target.depth:
+                up.append(source)
+                source = source.parent
+            else:
+                down.append(target)
+                target = target.parent
+        down.reverse()
+        return up, down
+
+    @property
+    def checkpoint_spacing(self):
+        return self.checkpoint_interval * 2 ** self.spacing_doublings
+
+    def remember_text(self):
+        """Remember the text in the current node if it is due for a checkpoint."""
+        node = self.current_node
+        # The root is skipped, such that a document that is hardly edited doesn't
+        # keep its text twice
+        if (node.checkpoint == None and node.depth > 0
+                and node.depth % self.checkpoint_spacing == 0):
+            node.checkpoint = self.doc.text
+            node.size += len(node.checkpoint)
+            self.usage += len(node.checkpoint)
+            self.checkpoints.append(node)
+            while len(self.checkpoints) > self.max_checkpoints:
+                self.spacing_doublings += 1
+                self.drop_checkpoints(lambda node: node.depth % self.checkpoint_spacing)
+
+    def forget_removed_checkpoints(self):
+        """
+        Forget the checkpoints of the nodes that have been removed from the tree.
+        Removed nodes are not charged anymore, so the usage stays the same.
+        """
+        def removed(node):
+            while node.parent != None:
+                node = node.parent
+            return node is not self.root
+        for node in self.checkpoints:
+            if removed(node):
+                node.size -= len(node.checkpoint)
+                node.checkpoint = None
+        self.checkpoints = [node for node in self.checkpoints if node.checkpoint != None]
+
+    def drop_checkpoints(self, condition):
+        """Drop the checkpoints of the nodes that satisfy condition."""
+        kept = []
+        for node in self.checkpoints:
+            if condition(node):
+                node.size -= len(node.checkpoint)
+                self.usage -= len(node.checkpoint)
+                node.checkpoint = None
+            else:
+                kept.append(node)
+        self.checkpoints = kept
 
     def add(self, command):
         """Add a new undoable command."""
+        self.load_history()
         if self.sequence != None:
             self.sequence.add_command(command)
         else:
+            # The command has not been executed yet
+            self.remember_text()
             node = Node(self.current_node)
             node.add_command(command)
-            self.current_node.add_child(node)
-            self.current_node = node
+            self.attach(node)
+
+    def attach(self, node):
+        """Add node as a child of current_node and make it the current node."""
+        # Removed nodes are recognized by not having a parent anymore
+        if self.unstored_node != None and self.unstored_node.parent != None:
+            self.store(self.unstored_node)
+        # Only the large contents of the newest node remain lazy until it is stored
+        for command in node.commands:
+            if isinstance(command, Operation):
+                self.payloads.materialise_small(command)
+        self.unstored_node = node
+        self.payloads.spill()
+
+        node.compute_size()
+        node.created = time()
+        self.current_node.add_child(node)
+        self.current_node = node
+        self.usage += node.size
+
+        # Usually the node is the most recent one, so this is an append
+        index = bisect_right(self.times, node.created)
+        self.times.insert(index, node.created)
+        self.timeline.insert(index, node)
+        self.prune()
+
+    def index_times(self):
+        """Rebuild the time index from the nodes in the tree."""
+        self.timeline = sorted(self.root.subtree(), key=lambda node: (node.created, node.id))
+        self.times = [node.created for node in self.timeline]
+
+    def node_at_time(self, moment):
+        """
+        Return the most recent node that was added at or before moment.
+        This is the state of the text at that moment, not taking undo into account.
+        If there is no such node, return the root.
+        """
+        index = bisect_right(self.times, moment)
+        return self.timeline[index - 1] if index > 0 else self.root
+
+    def store(self, node):
+        """Move the contents of the operations of node into the payload store."""
+        for command in node.commands:
+            if isinstance(command, Operation):
+                self.payloads.store_operation(command)
+        # The contents don't keep text revisions alive anymore
+        self.usage -= node.size
+        self.usage += node.compute_size()
 
     def hard_undo(self):
         """
@@ -72,13 +320,81 @@ class UndoTree:
             current_node = self.current_node
             self.undo()
             self.current_node.children.remove(current_node)
+            current_node.parent = None
+            self.usage -= current_node.subtree_size()
+            self.forget_removed_checkpoints()
+            self.index_times()
+
+    def rebase(self, operation):
+        """
+        Adjust the history to operation, which is about to be applied to the text
+        without being added to the tree, e.g. an operation of another user.
+        The commands on the path from the root to current_node are transformed,
+        such that undoing them reverts only their own changes and keeps operation.
+        Other branches and the checkpoints can't follow, so they are removed.
+        If a command that is not an operation is met, the history above it is removed.
+        Only the operations are transformed, so the text is not rebuilt for each node.
+        """
+        self.load_history()
+        if self.sequence != None:
+            raise Exception('Cannot rebase; a sequence of commands is being added')
+
+        self.drop_checkpoints(lambda node: True)
+        components = to_components(operation, len(self.doc.text))
+        node = self.current_node
+        child = None
+        while True:
+            for other in node.children:
+                if other is not child:
+                    self.remove(other)
+            node.children = [child] if child != None else []
+            if node.parent == None:
+                break
+
+            commands = []
+            for command in reversed(node.commands):
+                if not isinstance(command, Operation):
+                    break
+                rebased, components = transform_past(command, components)
+                if rebased != None:
+                    commands.append(rebased)
+            else:
+                if commands != node.commands[::-1]:
+                    node.commands = commands[::-1]
+                    self.store(node)
+                child = node
+                node = node.parent
+                continue
+
+            # Make node the new root
+            node.parent.children.remove(node)
+            self.remove(self.root)
+            node.parent = None
+            node.commands = []
+            self.usage -= node.size
+            self.usage += node.compute_size()
+            self.root = node
+            break
+
+    def remove(self, node):
+        """Remove the subtree rooted at node from the tree."""
+        node.parent = None
+        for removed in node.subtree():
+            self.usage -= removed.size
+            index = bisect_left(self.times, removed.created)
+            while self.timeline[index] is not removed:
+                index += 1
+            del self.times[index]
+            del self.timeline[index]
 
     def start_sequence(self):
         """
         Indicate start of a sequence.
         All incoming commands should be gathered and put into one compound command.
         """
+        self.load_history()
         if self.sequence_depth == 0:
+            self.remember_text()
             self.sequence = Node(self.current_node)
         self.sequence_depth += 1
         debug('Starting undo sequence. Entering depth: {}'.format(self.sequence_depth))
@@ -94,13 +410,82 @@ class UndoTree:
 
         if self.sequence_depth == 1:
             if self.sequence.commands != []:
-                self.current_node.add_child(self.sequence)
-                self.current_node = self.sequence
+                # Collapse the operations, such that undo and redo of the sequence
+                # can be done with a single splice
+                self.sequence.collapse()
+                self.attach(self.sequence)
             self.sequence_depth = 0
             self.sequence = None
         else:
             self.sequence_depth -= 1
 
+    def prune(self):
+        """
+        Remove nodes according to the pruning policy if the budget is exceeded.
+        To avoid pruning after every new command, we prune until three quarters
+        of the budget are used.
+        """
+        if self.memory_budget == None or self.usage <= self.memory_budget:
+            return
+        target = self.memory_budget * 3 // 4
+
+        path = set()
+        node = self.current_node
+        while node != None:
+            path.add(node)
+            node = node.parent
+
+        # Leaves that are not on the path, ordered by age
+        # The ids of loaded nodes follow the order in which they were stored,
+        # so the creation time comes first
+        leaves = [(node.created, node.id, node) for node in self.root.subtree()
+                  if not node.children and not node in path]
+        heapify(leaves)
+
+        while self.usage > target:
+            # Removed nodes are recognized by not having a parent anymore
+            while leaves and leaves[0][2].parent == None:
+                heappop(leaves)
+
+            # The oldest node on the path that can be removed, if any
+            path_child = None
+            if self.root is not self.current_node:
+                path_child = next(child for child in self.root.children if child in path)
+
+            if leaves and (path_child == None or self.pruning_policy == 'abandoned'
+                           or leaves[0][:2] < (path_child.created, path_child.id)):
+                _, _, leaf = heappop(leaves)
+                parent = leaf.parent
+                parent.children.remove(leaf)
+                leaf.parent = None
+                self.usage -= leaf.size
+                if not parent.children and not parent in path:
+                    heappush(leaves, (parent.created, parent.id, parent))
+            elif path_child != None:
+                # Make the next node on the path the new root
+                for child in self.root.children:
+                    if child is not path_child:
+                        for node in child.subtree():
+                            node.parent = None
+                            self.usage -= node.size
+                self.root.children = []
+                self.usage -= self.root.size
+                path.remove(self.root)
+                path_child.parent = None
+                path_child.commands = []
+                self.usage -= path_child.size
+                # Only the checkpoint of the new root remains
+                self.usage += path_child.compute_size()
+                self.root = path_child
+            else:
+                break
+        self.forget_removed_checkpoints()
+        self.index_times()
+        info('Pruned undo tree to {} characters'.format(self.usage))
+
+
+_node_ids = count()
+
 
 class Node:
 
@@ -110,14 +495,71 @@ class Node:
     """
 
     def __init__(self, parent):
+        self.id = next(_node_ids)
         self.parent = parent
+        self.depth = parent.depth + 1 if parent != None else 0
+        self.created = time()
         self.commands = []
         self.children = []
+        self.size = 0
+        self.checkpoint = None
+
+    def compute_size(self):
+        """
+        Compute the amount of characters of content that is stored in the commands
+        and the checkpoint. A TextSlice is charged for the length of the text revision
+        it keeps alive.
+        """
+        self.size = 0
+        revisions = {}
+        for command in self.commands:
+            if isinstance(command, Operation):
+                for content in chain(command.old_content, command.newcontent):
+                    if isinstance(content, TextSlice):
+                        revisions[id(content.text)] = len(content.text)
+                    else:
+                        self.size += len(content)
+        self.size += sum(revisions.values())
+        if self.checkpoint != None:
+            self.size += len(self.checkpoint)
+        return self.size
+
+    def cost(self):
+        """Return the amount of content that is processed to replay the commands."""
+        return self.size - len(self.checkpoint or '')
+
+    def subtree(self):
+        """Iterate over the nodes in the subtree rooted at this node."""
+        todo = [self]
+        while todo:
+            node = todo.pop()
+            yield node
+            todo.extend(node.children)
+
+    def subtree_size(self):
+        """Return the total size of the nodes in this subtree."""
+        return sum(node.compute_size() for node in self.subtree())
 
     def add_command(self, command):
         """Add an command to node."""
         self.commands.append(command)
 
+    def collapse(self):
+        """Compose each run of consecutive operations into a single operation."""
+        result = []
+        run = []
+        for command in self.commands:
+            if isinstance(command, Operation):
+                run.append(command)
+            else:
+                if run:
+                    result.append(compose_operations(run))
+                    run = []
+                result.append(command)
+        if run:
+            result.append(compose_operations(run))
+        self.commands = result
+
     def add_child(self, node):
         """Add a child to node. First child is most recent."""
         self.children.insert(0, node)
@@ -133,14 +575,47 @@ Document.OnDocumentInit.add(init)
 def undo(doc):
     """Undo last command."""
     doc.undotree.undo()
+undo.navigates_undotree = True
 commands.undo = undo
 
 
 def redo(doc):
     """Redo last undo."""
     doc.undotree.redo()
+redo.navigates_undotree = True
 commands.redo = redo
 
+
+def undo_to_time(seconds):
+    """
+    Command constructor to go back to the state of the text of given number of
+    seconds before the current state.
+    """
+    def command(doc):
+        tree = doc.undotree
+        tree.jump(tree.node_at_time(tree.current_node.created - seconds))
+    command.navigates_undotree = True
+    return command
+commands.undo_to_time = undo_to_time
+
+
+def redo_to_time(seconds):
+    """
+    Command constructor to go forward to the state of the text of given number of
+    seconds after the current state. Like redo, this follows the most recent child
+    of each node, so other branches are not entered.
+    """
+    def command(doc):
+        tree = doc.undotree
+        moment = tree.current_node.created + seconds
+        node = tree.current_node
+        while node.children and node.children[0].created <= moment:
+            node = node.children[0]
+        tree.jump(node)
+    command.navigates_undotree = True
+    return command
+commands.redo_to_time = redo_to_time
+
 class UndoMode(Mode):
 
     """
@@ -155,6 +630,8 @@ class UndoMode(Mode):
             'right': self.right,
             'up': self.up,
             'down': self.down,
+            'home': self.first,
+            'end': self.last,
         })
         self.allowedcommands.extend([
             next_document, previous_document, quit_document,
@@ -163,6 +640,11 @@ class UndoMode(Mode):
 
     def start(self, doc, *args, **kwargs):
         debug('Starting undo mode')
+        doc.undotree.load_history()
+        tree = doc.undotree
+        if tree.memory_budget != None:
+            doc.ui.notify('Undo history: {} of {} characters used ({})'.format(
+                tree.usage, tree.memory_budget, tree.pruning_policy))
         # Make sure the child_index is set to the index we now have
         self.child_index = self.current_index()
         Mode.start(self, doc, *args, **kwargs)
@@ -181,6 +663,19 @@ class UndoMode(Mode):
         self.child_index = 0
         doc.undotree.redo()
 
+    def first(self, doc):
+        """Jump to the start of the history."""
+        self.child_index = 0
+        doc.undotree.jump(doc.undotree.root)
+
+    def last(self, doc):
+        """Jump to the end of the most recent branch from here."""
+        self.child_index = 0
+        node = doc.undotree.current_node
+        while node.children:
+            node = node.children[0]
+        doc.undotree.jump(node)
+
     def up(self, doc):
         self.child_index -= 1
         # update_child_index() will take care of having a valid child_index
@@ -221,5 +716,6 @@ Document.OnModeInit.add(init_undomode)
 
 def undomode(doc):
     return doc.modes.undomode
+undomode.navigates_undotree = True
 commands.undomode = undomode
 
@@ -53,6 +53,34 @@ class UserInterfaceAPI(ABC):
         """
         pass
 
+    def _pollinput(self):
+        """
+        Return the next input from the user if it is immediately available,
+        and None otherwise. This must not block.
+        Userinterfaces that buffer input can override this, such that bursts of input
+        (e.g. resulting from a paste) can be processed at once.
+        """
+        return None
+
+    def inputpending(self):
+        """Check without blocking whether there is input available."""
+        if not self.inputqueue:
+            userinput = self._pollinput()
+            if userinput == None:
+                return False
+            self.inputqueue.appendleft(userinput)
+        return True
+
+    def getinputburst(self, accept):
+        """
+        Pop and return a list of all inputs that are immediately available,
+        up to the first input for which accept returns False. This never blocks.
+        """
+        burst = []
+        while self.inputpending() and accept(self.inputqueue[-1]):
+            burst.append(self.getinput())
+        return burst
+
     def getinput(self):
         """Pop and return the first object from the input queue. """
         if not self.inputqueue:
@@ -7,8 +7,16 @@ def refresh_selectionview(doc):
     textview_length = doc.view.text_length
     opos_to_vpos = doc.view.opos_to_vpos
 
+    # Only the intervals overlapping with the part of the text that is in view
+    # have to be mapped, which we can find by bisecting
+    # The last entry of opos_to_vpos is only there to map exclusive ends
+    viewport_end = viewport_offset + len(opos_to_vpos) - 1
+    visible = doc.selection.overlapping(viewport_offset, viewport_end)
+
+    # Since opos_to_vpos is monotone, the mapped intervals are sorted as well,
+    # so adding them to the selection view takes constant time each
     selectionview = Selection()
-    for beg, end in doc.selection:
+    for beg, end in doc.selection[visible]:
         beg = max(0, beg - viewport_offset)
         end = min(textview_length, end - viewport_offset)
         vbeg = opos_to_vpos[beg]